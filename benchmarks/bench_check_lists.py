@@ -0,0 +1,96 @@
+"""
+Benchmark hashing of a synthetic immutable tree in get_check_lists.
+
+    python -m benchmarks.bench_check_lists --files 5000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from joj3_config_generator.models import repo
+from joj3_config_generator.transformers import repo as repo_transformer
+from joj3_config_generator.transformers.repo import (
+    get_check_lists,
+    get_file_sha256sums,
+)
+
+
+def make_immutable_tree(
+    root: Path, files: int, file_size: int, large_files: int, large_file_size: int
+) -> None:
+    immutable_dir = root / "immutable"
+    for i in range(files):
+        file_path = immutable_dir / f"dir{i % 50}" / f"file{i}.bin"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(os.urandom(file_size))
+    for i in range(large_files):
+        (immutable_dir / f"large{i}.bin").write_bytes(os.urandom(large_file_size))
+    (root / "repo.toml").write_text("")
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def sequential_sha256sums(file_paths: List[Path]) -> List[str]:
+    # the 64 KiB read loop hashing one file after another
+    mmap_threshold = repo_transformer.MMAP_THRESHOLD
+    repo_transformer.MMAP_THRESHOLD = 1 << 62
+    try:
+        return get_file_sha256sums(file_paths, max_workers=1)
+    finally:
+        repo_transformer.MMAP_THRESHOLD = mmap_threshold
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--file-size", type=int, default=16 * 1024)
+    parser.add_argument("--large-files", type=int, default=4)
+    parser.add_argument("--large-file-size", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_immutable_tree(
+            root, args.files, args.file_size, args.large_files, args.large_file_size
+        )
+        repo_conf = repo.Config(grading_repo_name="bench")
+        repo_conf.root = root
+        repo_conf.path = Path("repo.toml")
+        file_paths = sorted(p for p in (root / "immutable").glob("**/*") if p.is_file())
+        assert sequential_sha256sums(file_paths) == get_file_sha256sums(
+            file_paths, args.workers
+        )
+        sequential_time = best_of(
+            args.repeat, lambda: sequential_sha256sums(file_paths)
+        )
+        concurrent_time = best_of(
+            args.repeat, lambda: get_file_sha256sums(file_paths, args.workers)
+        )
+        check_lists_time = best_of(args.repeat, lambda: get_check_lists(repo_conf))
+    total_mb = (
+        (args.files * args.file_size + args.large_files * args.large_file_size)
+        / 1024
+        / 1024
+    )
+    print(f"{args.files} files + {args.large_files} large files, {total_mb:.0f} MiB")
+    print(f"workers: {args.workers or os.cpu_count()}")
+    print(f"sequential: {sequential_time:.3f}s")
+    print(f"concurrent: {concurrent_time:.3f}s")
+    print(f"speedup:    {sequential_time / concurrent_time:.2f}x")
+    print(f"get_check_lists: {check_lists_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
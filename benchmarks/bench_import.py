@@ -0,0 +1,57 @@
+"""
+Report the import time of the joj3-forge cli, as measured by
+python -X importtime, with the modules taking the most time on their own.
+
+    python -m benchmarks.bench_import --top 15
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+def measure(module: str) -> Dict[str, Tuple[int, int]]:
+    # module -> (self, cumulative) in microseconds
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            import_times[name.strip()] = (int(self_time), int(cumulative))
+    return import_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="joj3_config_generator.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    totals = [run[args.module][1] for run in runs]
+    print(
+        f"import {args.module}: median {statistics.median(totals) / 1000:.1f}ms, "
+        f"best {min(totals) / 1000:.1f}ms of {args.repeat}"
+    )
+    self_times: List[Tuple[int, str]] = sorted(
+        (
+            (int(statistics.median(run[name][0] for run in runs if name in run)), name)
+            for name in runs[0]
+        ),
+        reverse=True,
+    )
+    for self_time, name in self_times[: args.top]:
+        print(f"{self_time / 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
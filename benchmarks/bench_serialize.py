@@ -0,0 +1,80 @@
+"""
+Benchmark the json backends on the result config of a task with many cases,
+in the default and the compact format.
+
+    python -m benchmarks.bench_serialize --cases 5000
+"""
+
+import argparse
+import copy
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from joj3_config_generator.compact import compact_result_dict
+from joj3_config_generator.generator import convert_joj3_conf
+from joj3_config_generator.loader import load_joj3_toml
+from joj3_config_generator.utils.serialize import JSON_BACKENDS, dumps_stdlib
+
+
+def make_task(root: Path, cases: int) -> Any:
+    (root / "repo.toml").write_text("")
+    task_dir = root / "hw1"
+    task_dir.mkdir()
+    for i in range(cases):
+        (task_dir / f"case{i}.in").write_text(f"{i}\n")
+        (task_dir / f"case{i}.out").write_text(f"{i}\n")
+    (task_dir / "task.toml").write_text(
+        'name = "hw1"\n'
+        "[[stages]]\n"
+        'name = "judge"\n'
+        'command = "./main"\n'
+        'parsers = ["diff", "result-detail"]\n'
+        'limit.cpu = "2s"\n'
+        'limit.mem = "256m"\n'
+        'case0.limit.cpu = "4s"\n'
+    )
+    repo_conf, task_conf = load_joj3_toml(
+        root, root / "repo.toml", task_dir / "task.toml"
+    )
+    return convert_joj3_conf(repo_conf, task_conf).model_dump(
+        mode="json", by_alias=True, exclude_none=True
+    )
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        result_dict = make_task(Path(tmp), args.cases)
+    expected = dumps_stdlib(result_dict)
+    print(f"{args.cases} cases, {len(expected.encode()) / 1024 / 1024:.1f} MiB")
+    baseline = best_of(args.repeat, lambda: dumps_stdlib(result_dict))
+    for name, dumps in JSON_BACKENDS.items():
+        assert dumps(result_dict) == expected, name
+        timing = best_of(args.repeat, lambda: dumps(result_dict))
+        print(f"{name:8} {timing:.3f}s  {baseline / timing:.2f}x")
+    compact_dict = copy.deepcopy(result_dict)
+    compact_result_dict(compact_dict)
+    compact = dumps_stdlib(compact_dict, compact=True)
+    print(f"compact  {len(compact.encode()) / 1024 / 1024:.1f} MiB")
+    for name, dumps in JSON_BACKENDS.items():
+        assert dumps(compact_dict, compact=True) == compact, name
+        timing = best_of(args.repeat, lambda: dumps(compact_dict, compact=True))
+        print(f"{name:8} {timing:.3f}s  {baseline / timing:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Time convert and its hot functions on a synthetic course tree, and compare
+with the baselines stored in benchmarks/baselines.json. The run fails if a
+benchmark is slower than its baseline by more than the threshold.
+
+Timings are divided by the time of a fixed pure python workload run right
+before each benchmark, which cancels out most of the difference in CPU speed
+between runs. File system speed is not accounted for, so store the baselines
+on the machine that runs the comparison.
+
+A change that makes a benchmark faster saves its baseline in the same
+commit, otherwise the suite would only catch a regression undoing it once it
+is slower than the old baseline. Benchmarks faster than their baseline by
+more than the threshold are reported as STALE for that reason.
+
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --only get_check_lists --save-baseline
+"""
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import tomli
+
+from benchmarks.tree import TreeShape, make_course_tree
+from joj3_config_generator.batch import find_tasks, run_tasks, write_result_json
+from joj3_config_generator.loader import check_unnecessary_fields, load_joj3_toml
+from joj3_config_generator.models import result, task
+from joj3_config_generator.transformers.repo import get_check_lists
+from joj3_config_generator.transformers.task import (
+    fix_diff,
+    get_executor_with,
+    remove_specified_cases,
+)
+from joj3_config_generator.utils.hashcache import set_hash_cache
+from joj3_config_generator.utils.logger import set_logger
+
+BASELINES_PATH = Path(__file__).resolve().parent / "baselines.json"
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def calibrate() -> None:
+    # a mix of the dict, string and regex work convert does
+    data = [
+        {"name": f"case{i}", "limit": i * 1000, "args": ["./main", str(i)]}
+        for i in range(2000)
+    ]
+    for _ in range(10):
+        text = json.dumps(data)
+        re.findall(r"case\d+", text)
+        sorted(json.loads(text), key=lambda x: x["name"])
+
+
+def get_benchmarks(root: Path, jobs: int) -> Dict[str, Callable[[], object]]:
+    tasks = find_tasks(root)
+    # tasks[0] is the health check conf.toml generated for the first repo
+    job = next(job for job in tasks if job.task_toml_path.name == "task.toml")
+    repo_conf, task_conf = load_joj3_toml(root, job.repo_toml_path, job.task_toml_path)
+    run_stage = task_conf.stages[-1]
+    task_dicts = [tomli.loads(job.task_toml_path.read_text()) for job in tasks]
+
+    def convert() -> None:
+        for res in run_tasks(root, find_tasks(root), jobs):
+            assert res.content is not None
+            write_result_json(res.job.result_json_path, res.content)
+
+    def run_fix_diff() -> None:
+        executor = result.Executor(
+            name="sandbox", with_=get_executor_with(run_stage, {})
+        )
+        fix_diff(
+            run_stage.diff,
+            result.Parser(name="diff"),
+            run_stage,
+            executor,
+            task_conf.root,
+            task_conf.path,
+        )
+
+    def run_load_joj3_toml() -> None:
+        for job in tasks:
+            load_joj3_toml(root, job.repo_toml_path, job.task_toml_path)
+
+    def run_check_unnecessary_fields() -> None:
+        for job, task_dict in zip(tasks, task_dicts):
+            check_unnecessary_fields(task.Config, task_dict, job.task_toml_path)
+
+    # many more cases than a task has, where a quadratic match would show
+    testcases = {f"cases/case{i}" for i in range(40_000)}
+    case_names = {f"case{i}" for i in range(0, 80_000, 3)}
+
+    return {
+        "convert": convert,
+        "fix_diff": run_fix_diff,
+        "get_check_lists": lambda: get_check_lists(repo_conf),
+        "load_joj3_toml": run_load_joj3_toml,
+        "check_unnecessary_fields": run_check_unnecessary_fields,
+        "remove_specified_cases": lambda: remove_specified_cases(testcases, case_names),
+    }
+
+
+def load_baselines() -> Dict[str, Any]:
+    try:
+        return dict(json.loads(BASELINES_PATH.read_text()))
+    except FileNotFoundError:
+        return {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repos", type=int, default=2)
+    parser.add_argument("--tasks", type=int, default=5)
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown relative to the baseline, 0.25 for 25%%",
+    )
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--only", nargs="*", default=None, help="names of the benchmarks to run"
+    )
+    args = parser.parse_args()
+    shape = TreeShape(args.repos, args.tasks, args.cases)
+    # the warnings of check_unnecessary_fields would flood the output
+    set_logger("ERROR")
+    set_hash_cache(None)
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_course_tree(root, shape)
+        for name, fn in get_benchmarks(root, args.jobs).items():
+            if args.only is not None and name not in args.only:
+                continue
+            calibration = best_of(args.repeat, calibrate)
+            timings[name] = best_of(args.repeat, fn) / calibration
+    baselines = load_baselines()
+    key = f"{shape} jobs={args.jobs}"
+    if args.save_baseline:
+        baselines[key] = {**baselines.get(key, {}), **timings}
+        BASELINES_PATH.write_text(
+            json.dumps(baselines, indent=4, sort_keys=True) + "\n"
+        )
+        print(f"Saved baselines for {key} to {BASELINES_PATH}")
+    baseline = baselines.get(key, {})
+    regressions: List[str] = []
+    stale: List[str] = []
+    print(f"tree {key}, best of {args.repeat}, relative to the calibration")
+    for name, timing in timings.items():
+        line = f"{name:26} {timing:10.3f}"
+        if name in baseline:
+            ratio = timing / baseline[name]
+            line += f"  {ratio:6.2f}x baseline"
+            if ratio > 1 + args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+            elif ratio < 1 - args.threshold:
+                line += "  STALE"
+                stale.append(name)
+        print(line)
+    if not baseline:
+        print(f"No baselines for {key}, run with --save-baseline to store them")
+    if stale:
+        print(
+            "Faster than the baseline, save it again with --save-baseline --only "
+            + " ".join(stale)
+        )
+    if regressions:
+        print(f"Slower than the baseline by more than {args.threshold:.0%}: ", end="")
+        print(", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
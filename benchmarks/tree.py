@@ -0,0 +1,123 @@
+"""
+Generate a synthetic course tree of JOJ3 toml configs, shaped like the trees
+in JTC: repos with immutable files, each with tasks made of a compile stage,
+code quality stages with keyword style parsers, and a run stage with cases.
+"""
+
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+REPO_TOML = """\
+grading-repo-name = "bench-grading"
+max-total-score = 100
+sandbox-token = "token"
+
+health-check.score = 0
+health-check.max-size = "10m"
+health-check.immutable-path = "immutable"
+health-check.required-files = ["README.md", "Changelog.md"]
+
+groups.name = ["", "joj", "run"]
+groups.max-count = [50, 1000, 100]
+groups.time-period-hour = [1, 24, 2]
+"""
+
+TASK_TOML = """\
+name = "{task_name}"
+max-total-score = 100
+
+time.end = 2024-12-30 23:59:59+08:00
+time.begin = 2024-12-29 23:59:59+08:00
+penalties.hours = [24, 48, 72]
+penalties.factors = [0.75, 0.5, 0.25]
+
+[[stages]]
+name = "Compilation"
+command = "make"
+files.import = ["tools/Makefile"]
+files.export = ["main"]
+limit.cpu = "10s"
+limit.mem = "256m"
+parsers = ["result-detail"]
+result-detail.exit-status = true
+result-detail.stderr = true
+
+[[stages]]
+name = "[cq] Filelength"
+command = "./tools/filelength 400 300 *.c *.h"
+files.import = ["tools/filelength"]
+parsers = ["keyword", "result-detail"]
+keyword.keyword = ["max", "recommended"]
+keyword.weight = [20, 10]
+result-detail.exit-status = true
+result-detail.stdout = true
+
+[[stages]]
+name = "[cq] Clang-tidy"
+command = "run-clang-tidy-18.py -p build"
+files.import = ["tests/.clang-tidy"]
+limit.stdout = "4m"
+parsers = ["clangtidy", "result-detail"]
+clangtidy.keyword = ["readability-function-size", "misc", "performance"]
+clangtidy.weight = [10, 5, 5]
+result-detail.exit-status = true
+
+[[stages]]
+name = "[joj] run"
+command = "./main"
+base-case-dir = "cases"
+limit.cpu = "1s"
+limit.mem = "256m"
+parsers = ["diff", "result-status", "result-detail"]
+diff.score = 5
+result-status.force-quit = false
+result-detail.exit-status = true
+result-detail.stderr = true
+"""
+
+# cases with limits overridden in the toml, every n-th case
+OVERRIDE_EVERY = 10
+
+
+class TreeShape(NamedTuple):
+    repos: int
+    tasks: int
+    cases: int
+    immutable_files: int = 100
+    immutable_file_size: int = 4096
+
+    def __str__(self) -> str:
+        return f"{self.repos}x{self.tasks}x{self.cases}"
+
+
+def make_task(task_dir: Path, task_name: str, cases: int) -> None:
+    case_dir = task_dir / "cases"
+    lines = [TASK_TOML.format(task_name=task_name)]
+    for i in range(cases):
+        # spread the cases over a few sub directories, as large tasks do
+        case_file_dir = case_dir / f"group{i % 4}" if i % 2 else case_dir
+        case_file_dir.mkdir(parents=True, exist_ok=True)
+        (case_file_dir / f"case{i}.in").write_text(f"{i} {i * 2}\n")
+        (case_file_dir / f"case{i}.out").write_text(f"{i * 3}\n")
+        if i % OVERRIDE_EVERY == 0:
+            lines.append(f'case{i}.limit.cpu = "2s"')
+            lines.append(f"case{i}.diff.score = 10")
+    (task_dir / "task.toml").write_text("\n".join(lines) + "\n")
+
+
+def make_repo(repo_dir: Path, shape: TreeShape) -> None:
+    immutable_dir = repo_dir / "immutable"
+    immutable_dir.mkdir(parents=True)
+    for i in range(shape.immutable_files):
+        (immutable_dir / f"file{i}").write_bytes(os.urandom(shape.immutable_file_size))
+    (repo_dir / "repo.toml").write_text(REPO_TOML)
+    for i in range(shape.tasks):
+        task_dir = repo_dir / f"h{i}"
+        task_dir.mkdir()
+        make_task(task_dir, f"h{i} ex1", shape.cases)
+
+
+def make_course_tree(root: Path, shape: TreeShape) -> None:
+    for i in range(shape.repos):
+        make_repo(root / f"repo{i}", shape)
@@ -0,0 +1,116 @@
+import os
+import subprocess  # nosec: B404
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import tomli
+
+from joj3_config_generator.batch import TaskJob
+from joj3_config_generator.models import repo, task
+from joj3_config_generator.transformers.repo import get_immutable_dir
+from joj3_config_generator.transformers.task import get_case_dir
+from joj3_config_generator.utils.index import IGNORE_FILENAME
+
+
+def absolute(path: Path) -> Path:
+    return Path(os.path.abspath(path))
+
+
+def git_changed_paths(root: Path, rev: str) -> List[Path]:
+    """
+    Files under root changed since rev in the working tree, including the
+    deleted and the untracked ones.
+    """
+    commands = [
+        ["git", "diff", "--name-only", "--no-renames", "--relative", rev, "--"],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    ]
+    paths = []
+    for command in commands:
+        output = subprocess.run(  # nosec: B603 B607
+            command, cwd=root, capture_output=True, text=True, check=True
+        ).stdout
+        paths += [root / line for line in output.splitlines() if line]
+    return paths
+
+
+def load_immutable_dir(repo_toml_path: Path) -> Optional[Path]:
+    try:
+        repo_conf = repo.Config(**tomli.loads(repo_toml_path.read_text()))
+    except (OSError, ValueError):
+        return None
+    repo_conf.root = repo_toml_path.parent
+    repo_conf.path = Path(repo_toml_path.name)
+    return absolute(get_immutable_dir(repo_conf))
+
+
+def load_case_dirs(task_toml_path: Path) -> Optional[List[Path]]:
+    try:
+        task_conf = task.Config(**tomli.loads(task_toml_path.read_text()))
+    except (OSError, ValueError):
+        return None
+    return [
+        absolute(get_case_dir(Path(), task_toml_path, stage))
+        for stage in task_conf.stages
+        if task.Parser.DIFF in stage.parsers
+    ]
+
+
+def is_input_dir_changed(input_dir: Path, changed: Iterable[Path]) -> bool:
+    for path in changed:
+        if path.is_relative_to(input_dir):
+            return True
+        # an ignore file changes what is listed in its directory and below
+        if path.name == IGNORE_FILENAME and input_dir.is_relative_to(path.parent):
+            return True
+    return False
+
+
+def select_affected_tasks(tasks: List[TaskJob], paths: Iterable[Path]) -> List[TaskJob]:
+    """
+    Keep the tasks whose json may change with the given changed paths: the
+    ones with a changed repo.toml or task toml, or a changed file in the
+    immutable directory of the repo or in the case directory of a diff stage.
+    A toml that can not be loaded counts as changed, so that the conversion
+    reports its errors.
+    """
+    changed = {absolute(path) for path in paths}
+    toml_paths = {
+        absolute(path)
+        for job in tasks
+        for path in [job.repo_toml_path, job.task_toml_path]
+    }
+    # files that are not tomls of the tasks, looked up in the input dirs
+    other_changed = changed - toml_paths
+    immutable_dirs: Dict[Path, Optional[Path]] = {}
+    affected = []
+    for job in tasks:
+        repo_toml_path = absolute(job.repo_toml_path)
+        task_toml_path = absolute(job.task_toml_path)
+        if repo_toml_path in changed or task_toml_path in changed:
+            affected.append(job)
+            continue
+        if not other_changed:
+            continue
+        if repo_toml_path not in immutable_dirs:
+            immutable_dirs[repo_toml_path] = load_immutable_dir(repo_toml_path)
+        immutable_dir = immutable_dirs[repo_toml_path]
+        case_dirs = load_case_dirs(task_toml_path)
+        if immutable_dir is None or case_dirs is None:
+            affected.append(job)
+            continue
+        if any(
+            is_input_dir_changed(input_dir, other_changed)
+            for input_dir in [immutable_dir, *case_dirs]
+        ):
+            affected.append(job)
+    return affected
+
+
+def get_changed_paths(
+    root: Path, paths: Optional[List[Path]], since: Optional[str]
+) -> List[Path]:
+    changed = list(paths or [])
+    if since is not None:
+        changed += git_changed_paths(root, since)
+    return changed
@@ -0,0 +1,61 @@
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from joj3_config_generator.batch import find_tasks, run_tasks
+from joj3_config_generator.utils.fs import FileSystem, OSFileSystem, OverlayFileSystem
+from joj3_config_generator.utils.hashcache import (
+    default_hash_cache_path,
+    get_hash_cache,
+    set_hash_cache,
+)
+from joj3_config_generator.utils.index import DirectoryIndex
+
+
+class ConvertError(Exception):
+    """
+    A task that failed to convert, as convert would write a failure json for
+    it. The message is the exception raised by the conversion, the details
+    are logged as usual.
+    """
+
+    def __init__(self, task_toml_path: Path, message: str) -> None:
+        super().__init__(f"Failed to convert {task_toml_path}: {message}")
+        self.task_toml_path = task_toml_path
+
+
+def convert_tree(
+    root: Path,
+    jobs: int = 1,
+    cache: Union[bool, Path] = False,
+    compact: bool = False,
+    fs: Optional[FileSystem] = None,
+) -> Iterator[Tuple[Path, Union[Dict[str, Any], ConvertError]]]:
+    """
+    Convert every task under root as the convert command does, without
+    writing any json. Yield the path of each task toml with the json it
+    would be converted to, as a dict, or the error it failed with.
+
+    With more than one job, tasks are converted in a process pool. cache
+    caches sha256 of immutable files in the default hash cache file if True,
+    or in the given sqlite file. The tree is read from fs, e.g. a
+    MemoryFileSystem, or from the disk if None, and is left unchanged: the
+    conf.toml added to a repo without tasks is only kept in memory.
+    """
+    previous_hash_cache = get_hash_cache()
+    if cache is True:
+        set_hash_cache(default_hash_cache_path())
+    else:
+        set_hash_cache(cache or None)
+    try:
+        index = DirectoryIndex(root, OverlayFileSystem(fs or OSFileSystem()))
+        tasks = find_tasks(root, index)
+        for res in run_tasks(root, tasks, jobs, index, compact=compact, as_dict=True):
+            task_toml_path = res.job.task_toml_path
+            if res.result_dict is None:
+                yield task_toml_path, ConvertError(
+                    task_toml_path, res.error or "unknown error"
+                )
+            else:
+                yield task_toml_path, res.result_dict
+    finally:
+        set_hash_cache(previous_hash_cache.path if previous_hash_cache else None)
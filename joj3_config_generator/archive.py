@@ -0,0 +1,214 @@
+import hashlib
+import os
+import stat
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, Optional
+
+from joj3_config_generator.utils import tracing
+from joj3_config_generator.utils.fs import DirEntry, MemoryFileSystem
+from joj3_config_generator.utils.index import IGNORE_FILENAME
+from joj3_config_generator.utils.logger import logger
+
+# members are hashed in chunks of this size, small ones in a single read
+READ_CHUNK_SIZE = 1024 * 1024
+# members read while converting, whose content is kept in memory
+KEPT_SUFFIXES = {".toml"}
+KEPT_NAMES = {IGNORE_FILENAME}
+
+
+class ArchiveFileSystem(MemoryFileSystem):
+    """
+    The members of an archive, listed in a single pass over it. Only the
+    content of the members read by the conversion is kept, the others are
+    known by their size and sha256, which is all the conversion needs of the
+    case and immutable files.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.digests: Dict[Path, str] = {}
+
+    def add_member(self, path: Path, content: Iterable[bytes]) -> None:
+        keep = path.suffix in KEPT_SUFFIXES or path.name in KEPT_NAMES
+        sha256_hash = hashlib.sha256()
+        chunks = []
+        size = 0
+        for chunk in content:
+            sha256_hash.update(chunk)
+            size += len(chunk)
+            if keep:
+                chunks.append(chunk)
+        self.add_entry(path, DirEntry(is_dir=False))
+        self.stats[path] = self.make_stat(size)
+        self.digests[path] = sha256_hash.hexdigest()
+        if keep:
+            self.files[path] = b"".join(chunks)
+
+    def add_link(self, path: Path, target: Path, is_symlink: bool) -> None:
+        """
+        Add path as a link to the file member target, which it shares the
+        stat, digest and content of, as a stat following symlinks would.
+        """
+        self.add_entry(path, DirEntry(is_dir=False, is_symlink=is_symlink))
+        self.stats[path] = self.stats[target]
+        self.digests[path] = self.digests[target]
+        if target in self.files:
+            self.files[path] = self.files[target]
+
+    def add_broken_symlink(self, path: Path) -> None:
+        # listed, but it does not stat, as on the disk
+        self.add_entry(path, DirEntry(is_dir=False, is_symlink=True))
+
+    def add_entry(self, path: Path, entry: DirEntry) -> None:
+        if path.parent not in self.dirs:
+            self.make_dir(path.parent)
+        self.dirs[path.parent][path.name] = entry
+
+    def get_sha256(self, path: Path) -> Optional[str]:
+        return self.digests.get(path)
+
+    def _read_bytes(self, path: Path) -> bytes:
+        if path in self.digests and path not in self.files:
+            raise OSError(f"Content of archive member {path} is not kept")
+        return super()._read_bytes(path)
+
+
+def iter_stream(stream: IO[bytes]) -> Iterator[bytes]:
+    return iter(lambda: stream.read(READ_CHUNK_SIZE), b"")
+
+
+def iter_tar_member(
+    tar_file: tarfile.TarFile, member: tarfile.TarInfo
+) -> Iterator[bytes]:
+    # read the data right after the header, extractfile would seek the
+    # underlying file several times for each member
+    fileobj = tar_file.fileobj
+    assert fileobj is not None
+    fileobj.seek(member.offset_data)
+    remaining = member.size
+    while remaining > 0:
+        chunk = fileobj.read(min(remaining, READ_CHUNK_SIZE))
+        if not chunk:
+            raise tarfile.ReadError(f"Unexpected end of data of {member.name}")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def get_member_path(root: Path, name: str) -> Optional[Path]:
+    if name.startswith("/") or ".." in name.split("/"):
+        logger.warning(f"Skipping archive member {name} outside of the archive")
+        return None
+    return root / name
+
+
+def get_symlink_target(path: Path, link_name: str, root: Path) -> Path:
+    target = Path(os.path.normpath(path.parent / link_name))
+    if link_name.startswith("/") or (target != root and root not in target.parents):
+        raise ValueError(f"Symlink {path} points outside of the archive")
+    return target
+
+
+def resolve_symlinks(fs: ArchiveFileSystem, symlinks: Dict[Path, Path]) -> None:
+    """
+    Add the symlinks, path -> target, once every member is read, as they may
+    point to members after them or to other symlinks. Symlinks to missing
+    members or in a loop are broken, symlinks to directories are not
+    supported.
+    """
+    pending = dict(symlinks)
+    while pending:
+        resolved = [path for path, target in pending.items() if target not in pending]
+        if not resolved:
+            # a loop, which does not stat on the disk either
+            for path in pending:
+                fs.add_broken_symlink(path)
+            return
+        for path in resolved:
+            target = pending.pop(path)
+            if target in fs.dirs:
+                raise ValueError(f"Symlink {path} to a directory is not supported")
+            if target in fs.digests:
+                fs.add_link(path, target, is_symlink=True)
+            else:
+                fs.add_broken_symlink(path)
+
+
+def load_archive(archive_path: Path, root: Path) -> ArchiveFileSystem:
+    """
+    List the members of a tar archive, compressed or not, or a zip archive,
+    as if it was extracted to root. Members are hashed as they are read, so
+    the archive is read once and nothing is extracted. Raise ValueError if
+    it is not a valid archive.
+    """
+    with tracing.span("read archive", path=str(archive_path)) as args:
+        try:
+            fs = read_archive(archive_path, root)
+        except (tarfile.TarError, zipfile.BadZipFile, EOFError, zlib.error) as e:
+            raise ValueError(f"Invalid archive: {e}") from e
+        args["members"] = len(fs.digests)
+    return fs
+
+
+def read_archive(archive_path: Path, root: Path) -> ArchiveFileSystem:
+    fs = ArchiveFileSystem()
+    fs.make_dir(root)
+    symlinks: Dict[Path, Path] = {}
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zip_file:
+            for info in zip_file.infolist():
+                member_path = get_member_path(root, info.filename)
+                if member_path is None:
+                    continue
+                if info.is_dir():
+                    fs.make_dir(member_path)
+                    continue
+                if stat.S_ISLNK(info.external_attr >> 16):
+                    # the content of a symlink is its target
+                    link_name = zip_file.read(info).decode()
+                    symlinks[member_path] = get_symlink_target(
+                        member_path, link_name, root
+                    )
+                    continue
+                with zip_file.open(info) as stream:
+                    fs.add_member(member_path, iter_stream(stream))
+    else:
+        # members are read in order, which is a single pass over the archive
+        # even if it is compressed, and faster than the streaming mode "r|*"
+        with tarfile.open(archive_path, mode="r:*") as tar_file:
+            for member in tar_file:
+                member_path = get_member_path(root, member.name)
+                if member_path is None:
+                    continue
+                if member.isdir():
+                    fs.make_dir(member_path)
+                    continue
+                if member.issym():
+                    symlinks[member_path] = get_symlink_target(
+                        member_path, member.linkname, root
+                    )
+                    continue
+                if member.islnk():
+                    # the target of a hard link is a file member before it
+                    target = get_member_path(root, member.linkname)
+                    if target is None or target not in fs.digests:
+                        raise tarfile.ReadError(
+                            f"Hard link {member.name} to missing member {member.linkname}"
+                        )
+                    fs.add_link(member_path, target, is_symlink=False)
+                    continue
+                if not member.isfile():
+                    logger.warning(
+                        f"Skipping archive member {member.name}, not a regular file"
+                    )
+                    continue
+                if member.issparse():
+                    sparse_stream = tar_file.extractfile(member)
+                    assert sparse_stream is not None
+                    fs.add_member(member_path, iter_stream(sparse_stream))
+                else:
+                    fs.add_member(member_path, iter_tar_member(tar_file, member))
+    resolve_symlinks(fs, symlinks)
+    return fs
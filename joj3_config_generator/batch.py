@@ -0,0 +1,422 @@
+import os
+import shutil
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional
+
+from joj3_config_generator.compact import compact_result_dict
+from joj3_config_generator.generator import (
+    convert_joj3_conf,
+    create_joj3_convert_failure_conf,
+    prepare_health_check,
+)
+from joj3_config_generator.loader import (
+    is_toml_empty,
+    load_joj3_repo_toml,
+    load_joj3_task_toml,
+)
+from joj3_config_generator.models import repo, result
+from joj3_config_generator.stream import dump_result_model
+from joj3_config_generator.utils import tracing
+from joj3_config_generator.utils.deps import (
+    Dependencies,
+    format_depfile,
+    format_listing_stamp,
+    record_file,
+    track_dependencies,
+)
+from joj3_config_generator.utils.hashcache import get_hash_cache, set_hash_cache
+from joj3_config_generator.utils.index import DirectoryIndex, use_index
+from joj3_config_generator.utils.logger import logger
+from joj3_config_generator.utils.serialize import dumps_json
+from joj3_config_generator.utils.tracing import Tracer, get_tracer, set_tracer
+
+if TYPE_CHECKING:
+    from loguru import Message, Record
+
+# repo.toml path -> parsed config, None if it is invalid
+RepoConfs = Dict[Path, Optional[repo.Config]]
+
+
+class TaskJob(NamedTuple):
+    repo_toml_path: Path
+    task_toml_path: Path
+    result_json_path: Path
+
+
+class TaskResult(NamedTuple):
+    job: TaskJob
+    # serialized json content, None if the conversion failed or with as_dict
+    content: Optional[str]
+    # records logged by a worker process, replayed by the parent
+    logs: List[Dict[str, Any]]
+    # inputs read during the conversion
+    deps: Optional[Dependencies] = None
+    # spans and counters traced by a worker process, merged by the parent
+    trace: Optional[Tracer] = None
+    # the exception raised by the conversion, if it failed
+    error: Optional[str] = None
+    # the json as a dict with as_dict, None if the conversion failed
+    result_dict: Optional[Dict[str, Any]] = None
+
+
+def dump_result_json(result_dict: Any, compact: bool = False) -> str:
+    with tracing.span("serialize"):
+        if compact:
+            compact_result_dict(result_dict)
+        return dumps_json(result_dict, compact)
+
+
+def dump_result_dict(
+    result_model: result.Config, compact: bool = False
+) -> Dict[str, Any]:
+    with tracing.span("dump"):
+        result_dict: Dict[str, Any] = result_model.model_dump(
+            mode="json", by_alias=True, exclude_none=True
+        )
+        if compact:
+            compact_result_dict(result_dict)
+    return result_dict
+
+
+def write_result_json(result_json_path: Path, content: str) -> bool:
+    """
+    Write content to result_json_path unless it is already there. The file is
+    replaced atomically, so readers never see a partially written config.
+    Return whether the file is written.
+    """
+    with tracing.span("write", path=str(result_json_path)) as span_args:
+        written = _write_result_json(result_json_path, content)
+        span_args["written"] = written
+    return written
+
+
+def is_result_json_fresh(result_json_path: Path, content: str) -> bool:
+    """
+    Whether result_json_path already holds content.
+    """
+    try:
+        with result_json_path.open(newline="") as result_file:
+            return result_file.read() == content
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def _write_result_json(result_json_path: Path, content: str) -> bool:
+    if is_result_json_fresh(result_json_path, content):
+        return False
+    result_json_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = result_json_path.with_name(f".{result_json_path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("w", newline="") as result_file:
+            result_file.write(content)
+        if result_json_path.exists():
+            shutil.copymode(result_json_path, tmp_path)
+        os.replace(tmp_path, result_json_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
+
+
+def get_depfile_path(result_json_path: Path) -> Path:
+    return result_json_path.with_name(f"{result_json_path.name}.d")
+
+
+def get_listing_stamp_path(result_json_path: Path) -> Path:
+    return result_json_path.with_name(f"{result_json_path.name}.listing")
+
+
+def write_depfile(res: TaskResult) -> bool:
+    """
+    Write the inputs read to convert res.job next to its json, as a make
+    style depfile, with a listing stamp rewritten only when the case or
+    immutable files found change. Return whether the depfile is written.
+    """
+    if res.deps is None:
+        return False
+    result_json_path = res.job.result_json_path
+    listing_stamp_path = get_listing_stamp_path(result_json_path)
+    listing_stamp = format_listing_stamp(res.deps)
+    if write_result_json(listing_stamp_path, listing_stamp) and (
+        result_json_path.exists()
+    ):
+        # an unchanged json is not rewritten, keep it newer than the stamp
+        os.utime(result_json_path)
+    content = format_depfile(result_json_path, res.deps, listing_stamp_path)
+    return write_result_json(get_depfile_path(result_json_path), content)
+
+
+def dump_failure_json(compact: bool = False) -> str:
+    result_model = create_joj3_convert_failure_conf()
+    result_dict = result_model.model_dump(mode="json", by_alias=True, exclude_none=True)
+    return dump_result_json(result_dict, compact)
+
+
+def write_failure_jsons(error_json_paths: List[Path], compact: bool = False) -> int:
+    content = dump_failure_json(compact)
+    return sum(
+        write_result_json(error_json_path, content)
+        for error_json_path in error_json_paths
+    )
+
+
+def check_failure_jsons(
+    error_json_paths: List[Path], compact: bool = False
+) -> List[Path]:
+    """
+    Return the paths in error_json_paths not holding the failure config.
+    """
+    content = dump_failure_json(compact)
+    return [
+        error_json_path
+        for error_json_path in error_json_paths
+        if not is_result_json_fresh(error_json_path, content)
+    ]
+
+
+def find_tasks(root: Path, index: Optional[DirectoryIndex] = None) -> List[TaskJob]:
+    """
+    Find the task toml files under root, each attributed to the repo.toml
+    in its nearest ancestor directory.
+    """
+    if index is None:
+        index = DirectoryIndex(root)
+    repo_toml_paths = index.glob(root, "**/repo.toml")
+    repo_dirs = {repo_toml_path.parent for repo_toml_path in repo_toml_paths}
+
+    def get_repo_dir(toml_path: Path) -> Path:
+        repo_dir = toml_path.parent
+        while repo_dir not in repo_dirs:
+            repo_dir = repo_dir.parent
+        return repo_dir
+
+    tasks = []
+    for repo_toml_path in repo_toml_paths:
+        repo_dir = repo_toml_path.parent
+        if not any(p != repo_toml_path for p in index.glob(repo_dir, "*.toml")):
+            fallback_toml_path = repo_dir / "conf.toml"
+            if not index.fs.exists(fallback_toml_path):
+                index.fs.write_text(
+                    fallback_toml_path, 'name = "health check"\nmax-total-score = 0\n'
+                )
+                index.add_file(fallback_toml_path)
+        for task_toml_path in index.glob(repo_dir, "**/*.toml"):
+            if (
+                task_toml_path.name == "repo.toml"
+                and task_toml_path.parent in repo_dirs
+            ):
+                continue
+            if index.is_dir(task_toml_path) or get_repo_dir(task_toml_path) != repo_dir:
+                continue
+            with use_index(index):
+                is_empty = is_toml_empty(task_toml_path)
+            if is_empty:
+                logger.info(f"Skipping empty task toml file {task_toml_path}")
+                continue
+            toml_name = task_toml_path.name.removesuffix(".toml")
+            result_json_path = task_toml_path.parent / f"{toml_name}.json"
+            tasks.append(TaskJob(repo_toml_path, task_toml_path, result_json_path))
+    return tasks
+
+
+def load_repos(
+    root: Path, tasks: List[TaskJob], repo_confs: Optional[RepoConfs] = None
+) -> RepoConfs:
+    """
+    Load each repo.toml once, instead of once per task. Repos already in
+    repo_confs are not loaded again.
+    """
+    if repo_confs is None:
+        repo_confs = {}
+    for job in tasks:
+        if job.repo_toml_path in repo_confs:
+            continue
+        try:
+            repo_confs[job.repo_toml_path] = load_joj3_repo_toml(
+                root, job.repo_toml_path
+            )
+        except Exception:
+            repo_confs[job.repo_toml_path] = None
+    return repo_confs
+
+
+def prepare_health_checks(tasks: List[TaskJob], repo_confs: RepoConfs) -> None:
+    """
+    Build the health check args of the repos of tasks before starting worker
+    processes, which get them cached in repo_confs instead of hashing the
+    immutable files again in each worker. Failures are left to the tasks.
+    """
+    for repo_toml_path in dict.fromkeys(job.repo_toml_path for job in tasks):
+        repo_conf = repo_confs.get(repo_toml_path)
+        if repo_conf is None:
+            continue
+        try:
+            prepare_health_check(repo_conf)
+        except Exception:
+            # converting its tasks fails with the same error
+            pass
+
+
+def convert_task(
+    root: Path,
+    job: TaskJob,
+    index: Optional[DirectoryIndex] = None,
+    repo_confs: Optional[RepoConfs] = None,
+    compact: bool = False,
+    as_dict: bool = False,
+) -> TaskResult:
+    with (
+        use_index(index),
+        track_dependencies() as deps,
+        tracing.span("task", cat="task", path=str(job.task_toml_path)),
+    ):
+        try:
+            if repo_confs is None or job.repo_toml_path not in repo_confs:
+                repo_conf = load_joj3_repo_toml(root, job.repo_toml_path)
+            else:
+                record_file(job.repo_toml_path)
+                loaded_repo_conf = repo_confs[job.repo_toml_path]
+                if loaded_repo_conf is None:
+                    raise ValueError(f"Invalid repo toml file {job.repo_toml_path}")
+                repo_conf = loaded_repo_conf
+            task_conf = load_joj3_task_toml(root, job.task_toml_path)
+            with tracing.span("transform"):
+                result_model = convert_joj3_conf(repo_conf, task_conf)
+            content: Optional[str] = None
+            result_dict: Optional[Dict[str, Any]] = None
+            if as_dict:
+                result_dict = dump_result_dict(result_model, compact)
+            else:
+                with tracing.span("serialize"):
+                    content = dump_result_model(result_model, compact)
+            error = None
+        except Exception as e:
+            content = result_dict = None
+            error = f"{type(e).__name__}: {e}"
+    return TaskResult(job, content, [], deps, error=error, result_dict=result_dict)
+
+
+_worker_logs: List[Dict[str, Any]] = []
+_worker_index: Optional[DirectoryIndex] = None
+_worker_repo_confs: Optional[RepoConfs] = None
+_worker_compact = False
+_worker_as_dict = False
+
+
+def get_log_entry(message: "Message") -> Dict[str, Any]:
+    record = message.record
+    return {
+        "level": record["level"].name,
+        "message": record["message"],
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+    }
+
+
+def _collect_worker_log(message: "Message") -> None:
+    _worker_logs.append(get_log_entry(message))
+
+
+def replay_logs(logs: List[Dict[str, Any]]) -> None:
+    for log in logs:
+
+        def patch_location(record: "Record", log: Dict[str, Any] = log) -> None:
+            record["name"] = log["name"]
+            record["function"] = log["function"]
+            record["line"] = log["line"]
+
+        logger.patch(patch_location).log(log["level"], log["message"])
+
+
+def _init_worker(
+    index: Optional[DirectoryIndex],
+    repo_confs: RepoConfs,
+    hash_cache_path: Optional[Path],
+    compact: bool,
+    as_dict: bool,
+    trace: bool,
+) -> None:
+    global _worker_index, _worker_repo_confs, _worker_compact, _worker_as_dict
+    _worker_index = index
+    _worker_repo_confs = repo_confs
+    _worker_compact = compact
+    _worker_as_dict = as_dict
+    if trace:
+        tracemalloc.start()
+        set_tracer(Tracer())
+    set_hash_cache(hash_cache_path)
+    logger.remove()
+    logger.add(_collect_worker_log, level=0)
+
+
+def _convert_task_in_worker(root: Path, job: TaskJob) -> TaskResult:
+    _worker_logs.clear()
+    res = convert_task(
+        root, job, _worker_index, _worker_repo_confs, _worker_compact, _worker_as_dict
+    )
+    tracer = get_tracer()
+    return res._replace(
+        logs=list(_worker_logs), trace=tracer.drain() if tracer else None
+    )
+
+
+def log_task_start(job: TaskJob) -> None:
+    logger.info(
+        f"Converting {job.repo_toml_path} & {job.task_toml_path} to {job.result_json_path}"
+    )
+
+
+def run_tasks(
+    root: Path,
+    tasks: List[TaskJob],
+    jobs: int,
+    index: Optional[DirectoryIndex] = None,
+    repo_confs: Optional[RepoConfs] = None,
+    compact: bool = False,
+    as_dict: bool = False,
+) -> Iterator[TaskResult]:
+    """
+    Convert tasks in order. With more than one job, tasks are converted in a
+    process pool, and the logs of each task are replayed as a group once it is
+    done, so the output is the same as the sequential run. With as_dict, the
+    results hold the dumped json as a dict instead of its content.
+    """
+    with use_index(index):
+        repo_confs = load_repos(root, tasks, repo_confs)
+    hash_cache = get_hash_cache()
+    tracer = get_tracer()
+    if jobs <= 1 or len(tasks) <= 1:
+        for job in tasks:
+            log_task_start(job)
+            yield convert_task(root, job, index, repo_confs, compact, as_dict)
+        return
+    with use_index(index):
+        prepare_health_checks(tasks, repo_confs)
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(tasks)),
+        initializer=_init_worker,
+        initargs=(
+            index,
+            repo_confs,
+            hash_cache.path if hash_cache else None,
+            compact,
+            as_dict,
+            tracer is not None,
+        ),
+    ) as executor:
+        results = executor.map(
+            _convert_task_in_worker, [root] * len(tasks), tasks, chunksize=1
+        )
+        for res in results:
+            log_task_start(res.job)
+            replay_logs(res.logs)
+            if tracer is not None and res.trace is not None:
+                tracer.merge(res.trace)
+            yield res._replace(trace=None)
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
@@ -0,0 +1,97 @@
+import copy
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel
+
+from joj3_config_generator.models import result
+
+# defaults JOJ3 fills in itself, besides the zero values of go
+JOJ3_DEFAULTS: Dict[Type[BaseModel], List[str]] = {
+    result.DiffOutputConfig: ["maxDiffLength", "maxDiffLines"],
+}
+
+STAGE_GROUPS = ["preStages", "stages", "postStages"]
+
+
+def is_zero_value(value: Any) -> bool:
+    return value in (0, "", [], {})
+
+
+def get_omittable_defaults(model_type: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Serialized fields of model_type whose default can be left out of the
+    json, as JOJ3 ends up with the same value when the field is missing.
+    """
+    defaults = model_type().model_dump(mode="json", by_alias=True)
+    return {
+        key: value
+        for key, value in defaults.items()
+        if is_zero_value(value) or key in JOJ3_DEFAULTS.get(model_type, [])
+    }
+
+
+CMD_DEFAULTS = get_omittable_defaults(result.Cmd)
+DIFF_OUTPUT_DEFAULTS = get_omittable_defaults(result.DiffOutputConfig)
+
+
+def iter_stages(result_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [stage for group in STAGE_GROUPS for stage in result_dict.get(group) or []]
+
+
+def iter_diff_outputs(stage: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        output
+        for parser in stage.get("parsers", [])
+        if parser.get("name") == "diff"
+        for case in parser.get("with", {}).get("cases", [])
+        for output in case.get("outputs", [])
+    ]
+
+
+def compact_case(case: Dict[str, Any], default_cmd: Dict[str, Any]) -> None:
+    for key in [key for key, value in case.items() if default_cmd.get(key) == value]:
+        del case[key]
+
+
+def compact_diff_output(output: Dict[str, Any]) -> None:
+    for key, value in DIFF_OUTPUT_DEFAULTS.items():
+        if key in output and output[key] == value:
+            del output[key]
+
+
+def compact_result_dict(result_dict: Dict[str, Any]) -> None:
+    """
+    Strip the fields JOJ3 would fill in itself from a dumped result.Config in
+    place: zero values and JOJ3 defaults of the default cmd and diff outputs,
+    and fields of a case that are the same as in the default cmd of its stage.
+    """
+    for stage in iter_stages(result_dict):
+        executor_with = stage.get("executor", {}).get("with", {})
+        default_cmd = executor_with.get("default", {})
+        for case in executor_with.get("cases", []):
+            compact_case(case, default_cmd)
+        for key, value in CMD_DEFAULTS.items():
+            if key in default_cmd and default_cmd[key] == value:
+                del default_cmd[key]
+        for output in iter_diff_outputs(stage):
+            compact_diff_output(output)
+
+
+def resolve_result_dict(result_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill in the stripped defaults and merge every case into the default cmd of
+    its stage, the way JOJ3 reads the config. A compact config and the full
+    one resolve to the same dict.
+    """
+    result_dict = copy.deepcopy(result_dict)
+    for stage in iter_stages(result_dict):
+        executor_with = stage.setdefault("executor", {}).setdefault("with", {})
+        default_cmd = {**CMD_DEFAULTS, **executor_with.get("default", {})}
+        executor_with["default"] = default_cmd
+        executor_with["cases"] = [
+            {**default_cmd, **case} for case in executor_with.get("cases", [])
+        ]
+        for output in iter_diff_outputs(stage):
+            for key, value in DIFF_OUTPUT_DEFAULTS.items():
+                output.setdefault(key, value)
+    return result_dict
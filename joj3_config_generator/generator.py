@@ -1,31 +1,52 @@
 import os
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
 
-from joj3_config_generator.models import answer, common, joj1, repo, result, task
+from joj3_config_generator.models import common, repo, result, task
 from joj3_config_generator.models.const import (
     ACTOR_CSV_PATH,
     JOJ3_LOG_BASE_PATH,
     JOJ3_LOG_FILENAME,
     TEAPOT_CONFIG_ROOT,
 )
-from joj3_config_generator.transformers.answer import get_task_conf_from_answers
-from joj3_config_generator.transformers.joj1 import get_task_conf_from_joj1
 from joj3_config_generator.transformers.repo import (
+    get_health_check_args,
     get_health_check_stage,
     get_teapot_env,
     get_teapot_post_stage,
 )
 from joj3_config_generator.transformers.task import get_conf_stage
 
+if TYPE_CHECKING:
+    # imported in the functions using them, convert does not need them
+    from joj3_config_generator.models import answer, joj1
+
+
+def create_joj3_task_conf(answers: "answer.Answers") -> task.Config:
+    from joj3_config_generator.transformers.answer import get_task_conf_from_answers
 
-def create_joj3_task_conf(answers: answer.Answers) -> task.Config:
     return get_task_conf_from_answers(answers)
 
 
-def convert_joj1_conf(joj1_conf: joj1.Config) -> task.Config:
+def convert_joj1_conf(joj1_conf: "joj1.Config") -> task.Config:
+    from joj3_config_generator.transformers.joj1 import get_task_conf_from_joj1
+
     return get_task_conf_from_joj1(joj1_conf)
 
 
+def has_health_check_stage(repo_conf: repo.Config) -> bool:
+    current_test = os.environ.get("PYTEST_CURRENT_TEST") is not None
+    return not repo_conf.force_skip_health_check_on_test or not current_test
+
+
+def prepare_health_check(repo_conf: repo.Config) -> None:
+    """
+    Hash the immutable files of repo_conf, as converting its first task would,
+    so the health check args are cached in repo_conf.
+    """
+    if has_health_check_stage(repo_conf):
+        get_health_check_args(repo_conf)
+
+
 def convert_joj3_conf(repo_conf: repo.Config, task_conf: task.Config) -> result.Config:
     # Create the base ResultConf object
     result_conf = result.Config(
@@ -38,7 +59,7 @@ def convert_joj3_conf(repo_conf: repo.Config, task_conf: task.Config) -> result.
 
     current_test = os.environ.get("PYTEST_CURRENT_TEST") is not None
     # Construct health check stage
-    if not repo_conf.force_skip_health_check_on_test or not current_test:
+    if has_health_check_stage(repo_conf):
         result_conf.stages.append(get_health_check_stage(repo_conf, task_conf))
     cached: Dict[str, None] = {}
     # Convert each stage in the task configuration
@@ -1,28 +1,50 @@
 import json
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Tuple, Type, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    cast,
+)
 
-import inquirer
 import tomli
-import yaml
 from pydantic import AliasChoices, BaseModel, ValidationError
 
-from joj3_config_generator.models import answer, joj1, repo, task
+from joj3_config_generator.models import repo, task
 from joj3_config_generator.models.common import Memory, Time
+from joj3_config_generator.utils import deps, tracing
+from joj3_config_generator.utils.fs import get_fs
 from joj3_config_generator.utils.logger import logger
 
+if TYPE_CHECKING:
+    # imported in the functions using them, convert does not need them
+    from joj3_config_generator.models import answer, joj1
+
 
 def is_toml_empty(toml_path: Path) -> bool:
-    if toml_path.stat().st_size == 0:
+    fs = get_fs()
+    st = fs.stat(toml_path)
+    if st is not None and st.st_size == 0:
         return True
     try:
-        data = tomli.loads(toml_path.read_text())
+        data = tomli.loads(fs.read_text(toml_path))
         return not data
     except tomli.TOMLDecodeError:
         return False
 
 
-def load_joj3_task_toml_answers() -> answer.Answers:
+def load_joj3_task_toml_answers() -> "answer.Answers":
+    import inquirer
+
+    from joj3_config_generator.models import answer
+
     name = inquirer.text("What's the task name?", default="hw0")
     language = inquirer.list_input(
         "What's the language?", choices=[(cls.name, cls) for cls in answer.LANGUAGES]
@@ -49,135 +71,163 @@ def load_joj3_task_toml_answers() -> answer.Answers:
     return answer.Answers(name=name, language=language)
 
 
-def load_joj1_yaml(yaml_path: Path) -> joj1.Config:
-    joj1_obj = yaml.safe_load(yaml_path.read_text())
+def load_joj1_yaml(yaml_path: Path) -> "joj1.Config":
+    import yaml
+
+    from joj3_config_generator.models import joj1
+
+    joj1_obj = yaml.safe_load(get_fs().read_text(yaml_path))
     return joj1.Config(**joj1_obj)
 
 
-def load_joj3_toml(
-    root_path: Path, repo_toml_path: Path, task_toml_path: Path
-) -> Tuple[repo.Config, task.Config]:
-    def check_unnecessary_fields(
-        pydantic_model_type: Type[BaseModel],
-        input_dict: Dict[str, Any],
-        file_path: Path,
-        current_path: str = "",
-    ) -> None:
-        def format_value_for_toml_warning(value: Any) -> str:
-            if isinstance(value, str):
-                escaped_value = value.replace("\\", "\\\\").replace('"', '\\"')
-                return f'"{escaped_value}"'
-            elif isinstance(value, bool):
-                return str(value).lower()
-            elif isinstance(value, (int, float)):
-                return str(value)
-            elif isinstance(value, Path):
-                escaped_value = str(value).replace("\\", "\\\\").replace('"', '\\"')
-                return f'"{escaped_value}"'
-            elif isinstance(value, list):
-                formatted_elements = [
-                    format_value_for_toml_warning(item) for item in value
-                ]
-                return f"[{', '.join(formatted_elements)}]"
-            elif isinstance(value, dict):
-                return json.dumps(value, separators=(",", ":"))
-            elif value is None:
-                return "None"
-            else:
-                return repr(value)
-
-        default_instance = pydantic_model_type.model_construct()
-        for field_name, field_info in pydantic_model_type.model_fields.items():
-            should_warn = False
-            full_field_path = (
-                f"{current_path}.{field_name}" if current_path else field_name
+def format_value_for_toml_warning(value: Any) -> str:
+    if isinstance(value, str):
+        escaped_value = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped_value}"'
+    elif isinstance(value, bool):
+        return str(value).lower()
+    elif isinstance(value, (int, float)):
+        return str(value)
+    elif isinstance(value, Path):
+        escaped_value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped_value}"'
+    elif isinstance(value, list):
+        formatted_elements = [format_value_for_toml_warning(item) for item in value]
+        return f"[{', '.join(formatted_elements)}]"
+    elif isinstance(value, dict):
+        return json.dumps(value, separators=(",", ":"))
+    elif value is None:
+        return "None"
+    else:
+        return repr(value)
+
+
+class FieldCheck(NamedTuple):
+    field_name: str
+    # keys the field may have in the toml, the first one present is used
+    toml_names: Tuple[str, ...]
+    # model of the field, or of the items if is_list
+    nested_model_type: Optional[Type[BaseModel]]
+    is_list: bool
+    # whether a toml value is the same as the default, thus unnecessary
+    is_default: Callable[[Any], bool]
+
+
+def get_default_comparator(default_value: Any) -> Callable[[Any], bool]:
+    def is_equal(toml_value: Any) -> bool:
+        return bool(toml_value == default_value and toml_value != {})
+
+    if isinstance(default_value, Path):
+        return lambda toml_value: (
+            isinstance(toml_value, str) and Path(toml_value) == default_value
+        ) or is_equal(toml_value)
+    if isinstance(default_value, Time):
+        return lambda toml_value: Time(toml_value) == default_value or is_equal(
+            toml_value
+        )
+    if isinstance(default_value, Memory):
+        return lambda toml_value: Memory(toml_value) == default_value or is_equal(
+            toml_value
+        )
+    return is_equal
+
+
+@lru_cache(maxsize=None)
+def get_field_checks(pydantic_model_type: Type[BaseModel]) -> List[FieldCheck]:
+    """
+    Work out once per model how check_unnecessary_fields handles each field.
+    """
+    default_instance = pydantic_model_type.model_construct()
+    field_checks = []
+    for field_name, field_info in pydantic_model_type.model_fields.items():
+        toml_names: Tuple[str, ...] = ()
+        if isinstance(field_info.validation_alias, str):
+            toml_names = (field_info.validation_alias,)
+        elif isinstance(field_info.validation_alias, AliasChoices):
+            toml_names = tuple(
+                choice
+                for choice in field_info.validation_alias.choices
+                if isinstance(choice, str)
+            )
+        annotation = field_info.annotation
+        nested_model_type: Optional[Type[BaseModel]] = None
+        is_list = False
+        if (
+            getattr(annotation, "__origin__", None) is list
+            and len(getattr(annotation, "__args__", ())) == 1
+            and isinstance(annotation.__args__[0], type)  # type: ignore[union-attr]
+            and issubclass(annotation.__args__[0], BaseModel)  # type: ignore[union-attr]
+        ):
+            nested_model_type = annotation.__args__[0]  # type: ignore[union-attr]
+            is_list = True
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            nested_model_type = annotation
+        field_checks.append(
+            FieldCheck(
+                field_name,
+                (*toml_names, field_name),
+                nested_model_type,
+                is_list,
+                get_default_comparator(getattr(default_instance, field_name)),
             )
-            toml_field_name = field_name
-            if field_info.validation_alias:
-                if isinstance(field_info.validation_alias, str):
-                    if field_info.validation_alias in input_dict:
-                        toml_field_name = field_info.validation_alias
-                elif isinstance(field_info.validation_alias, AliasChoices):
-                    for choice in field_info.validation_alias.choices:
-                        if choice in input_dict:
-                            if isinstance(choice, str):
-                                toml_field_name = choice
-                                break
-            if toml_field_name not in input_dict:
-                continue
-            toml_value = input_dict[toml_field_name]
-            default_value = getattr(default_instance, field_name)
+        )
+    return field_checks
+
+
+def check_unnecessary_fields(
+    pydantic_model_type: Type[BaseModel],
+    input_dict: Dict[str, Any],
+    file_path: Path,
+    current_path: str = "",
+) -> None:
+    for field_check in get_field_checks(pydantic_model_type):
+        toml_field_name = next(
+            (name for name in field_check.toml_names if name in input_dict), None
+        )
+        if toml_field_name is None:
+            continue
+        toml_value = input_dict[toml_field_name]
+        full_field_path = (
+            f"{current_path}.{field_check.field_name}"
+            if current_path
+            else field_check.field_name
+        )
+        if field_check.nested_model_type is not None:
             # Handle List[Pydantic.BaseModel]
-            if (
-                field_info.annotation is not None
-                and hasattr(field_info.annotation, "__origin__")
-                and field_info.annotation.__origin__ is list
-                and hasattr(field_info.annotation, "__args__")
-                and len(field_info.annotation.__args__) == 1
-                and isinstance(field_info.annotation.__args__[0], type)
-                and issubclass(field_info.annotation.__args__[0], BaseModel)
-            ):
-                nested_model_type = field_info.annotation.__args__[0]
-                # Ensure the TOML value is a list (as expected for this type)
+            if field_check.is_list:
                 if isinstance(toml_value, list):
                     for i, toml_item in enumerate(toml_value):
                         if isinstance(toml_item, dict):
                             check_unnecessary_fields(
-                                nested_model_type,
+                                field_check.nested_model_type,
                                 toml_item,
                                 file_path,
                                 f"{full_field_path}[{i}]",
                             )
-                continue
             # Handle directly nested Pydantic models (non-list)
-            if isinstance(field_info.annotation, type) and issubclass(
-                field_info.annotation, BaseModel
-            ):
-                if isinstance(toml_value, dict):
-                    check_unnecessary_fields(
-                        field_info.annotation,
-                        toml_value,
-                        file_path,
-                        full_field_path,
-                    )
-                continue
-            # Handle Path type
-            elif (
-                isinstance(toml_value, str)
-                and isinstance(default_value, Path)
-                and Path(toml_value) == default_value
-            ):
-                should_warn = True
-            # Handle Time type
-            elif isinstance(default_value, Time) and Time(toml_value) == default_value:
-                should_warn = True
-            # Handle Memory type
-            elif (
-                isinstance(default_value, Memory)
-                and Memory(toml_value) == default_value
-            ):
-                should_warn = True
-            # Handle non-model list types (e.g., List[str], List[int])
-            elif (
-                isinstance(toml_value, list)
-                and isinstance(default_value, list)
-                and toml_value == default_value
-            ):
-                should_warn = True
-            # Handle other basic types (str, int, float, bool, dict)
-            elif toml_value == default_value and toml_value != {}:
-                should_warn = True
-            if should_warn:
-                logger.warning(
-                    f"In file {file_path}, unnecessary field "
-                    f"`{full_field_path} = {format_value_for_toml_warning(toml_value)}`"
-                    " can be removed as it matches the default value"
+            elif isinstance(toml_value, dict):
+                check_unnecessary_fields(
+                    field_check.nested_model_type,
+                    toml_value,
+                    file_path,
+                    full_field_path,
                 )
+            continue
+        if field_check.is_default(toml_value):
+            logger.warning(
+                f"In file {file_path}, unnecessary field "
+                f"`{full_field_path} = {format_value_for_toml_warning(toml_value)}`"
+                " can be removed as it matches the default value"
+            )
 
-    repo_obj = tomli.loads(repo_toml_path.read_text())
-    task_obj = tomli.loads(task_toml_path.read_text())
+
+def load_joj3_repo_toml(root_path: Path, repo_toml_path: Path) -> repo.Config:
+    deps.record_file(repo_toml_path)
+    with tracing.span("read toml", path=str(repo_toml_path)):
+        repo_obj = tomli.loads(get_fs().read_text(repo_toml_path))
     try:
-        repo_conf = repo.Config(**repo_obj)
+        with tracing.span("validate", path=str(repo_toml_path)):
+            repo_conf = repo.Config(**repo_obj)
     except ValidationError as e:
         logger.error(
             f"Error parsing {repo_toml_path}, most likely to be unknown fields, check the latest sample toml carefully:\n{e}"
@@ -185,8 +235,18 @@ def load_joj3_toml(
         raise
     repo_conf.root = root_path
     repo_conf.path = repo_toml_path.relative_to(root_path)
+    with tracing.span("check_unnecessary_fields", path=str(repo_toml_path)):
+        check_unnecessary_fields(repo.Config, repo_obj, repo_toml_path)
+    return repo_conf
+
+
+def load_joj3_task_toml(root_path: Path, task_toml_path: Path) -> task.Config:
+    deps.record_file(task_toml_path)
+    with tracing.span("read toml", path=str(task_toml_path)):
+        task_obj = tomli.loads(get_fs().read_text(task_toml_path))
     try:
-        task_conf = task.Config(**task_obj)
+        with tracing.span("validate", path=str(task_toml_path)):
+            task_conf = task.Config(**task_obj)
     except ValidationError as e:
         logger.error(
             f"Error parsing {task_toml_path}, most likely to be unknown fields, check the latest sample toml carefully:\n{e}"
@@ -194,6 +254,14 @@ def load_joj3_toml(
         raise
     task_conf.root = root_path
     task_conf.path = task_toml_path.relative_to(root_path)
-    check_unnecessary_fields(repo.Config, repo_obj, repo_toml_path)
-    check_unnecessary_fields(task.Config, task_obj, task_toml_path)
+    with tracing.span("check_unnecessary_fields", path=str(task_toml_path)):
+        check_unnecessary_fields(task.Config, task_obj, task_toml_path)
+    return task_conf
+
+
+def load_joj3_toml(
+    root_path: Path, repo_toml_path: Path, task_toml_path: Path
+) -> Tuple[repo.Config, task.Config]:
+    repo_conf = load_joj3_repo_toml(root_path, repo_toml_path)
+    task_conf = load_joj3_task_toml(root_path, task_toml_path)
     return repo_conf, task_conf
@@ -1,26 +1,41 @@
-import json
+import subprocess  # nosec: B404
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-import tomlkit
 import typer
 from typing_extensions import Annotated
 
 from joj3_config_generator import get_version
+from joj3_config_generator.affected import get_changed_paths, select_affected_tasks
+from joj3_config_generator.batch import (
+    check_failure_jsons,
+    default_jobs,
+    find_tasks,
+    is_result_json_fresh,
+    run_tasks,
+    write_depfile,
+    write_failure_jsons,
+    write_result_json,
+)
 from joj3_config_generator.generator import (
     convert_joj1_conf,
-    convert_joj3_conf,
-    create_joj3_convert_failure_conf,
     create_joj3_task_conf,
 )
 from joj3_config_generator.loader import (
-    is_toml_empty,
     load_joj1_yaml,
     load_joj3_task_toml_answers,
-    load_joj3_toml,
 )
+from joj3_config_generator.manifest import MANIFEST_FILENAME, Manifest
 from joj3_config_generator.models.const import JOJ3_CONFIG_ROOT
+from joj3_config_generator.utils.fs import FileSystem
+from joj3_config_generator.utils.hashcache import (
+    default_hash_cache_path,
+    set_hash_cache,
+)
+from joj3_config_generator.utils.index import DirectoryIndex, use_index
 from joj3_config_generator.utils.logger import logger
+from joj3_config_generator.utils.tracing import count, start_tracing, stop_tracing
+from joj3_config_generator.watch import Watcher
 
 app = typer.Typer(add_completion=False, name="joj3-forge")
 
@@ -56,6 +71,8 @@ def create(
     """
     [WIP] Create a new JOJ3 task toml config file
     """
+    import tomlkit
+
     answers = load_joj3_task_toml_answers()
     task_model = create_joj3_task_conf(answers)
     result_dict = task_model.model_dump(
@@ -75,6 +92,8 @@ def convert_joj1(yaml_path: Path, toml_path: Path) -> None:
     """
     [WIP] Convert a JOJ1 yaml config file to JOJ3 task toml config file
     """
+    import tomlkit
+
     logger.info(f"Converting yaml file {yaml_path}")
     joj1_model = load_joj1_yaml(yaml_path)
     task_model = convert_joj1_conf(joj1_model)
@@ -87,63 +106,265 @@ def convert(
     root: Annotated[
         Path,
         typer.Argument(
-            help=f"root directory of config files, located at {JOJ3_CONFIG_ROOT} in JTC"
+            help=f"root directory of config files, located at {JOJ3_CONFIG_ROOT} in JTC, or a tar or zip archive of it",
         ),
     ] = Path("."),
+    jobs: Annotated[
+        int,
+        typer.Option(
+            "--jobs",
+            "-j",
+            min=1,
+            help="number of worker processes, defaults to the CPU count",
+            show_default=False,
+        ),
+    ] = default_jobs(),
+    incremental: Annotated[
+        bool,
+        typer.Option(
+            "--incremental",
+            help=f"skip tasks whose inputs are unchanged since the last run, tracked in {MANIFEST_FILENAME} under the root",
+        ),
+    ] = False,
+    hash_cache: Annotated[
+        bool,
+        typer.Option(
+            help=f"cache sha256 of immutable files in {default_hash_cache_path()}",
+        ),
+    ] = True,
+    watch: Annotated[
+        bool,
+        typer.Option(
+            "--watch",
+            help="keep running and reconvert the tasks affected by changed files",
+        ),
+    ] = False,
+    interval: Annotated[
+        float,
+        typer.Option(help="seconds between polls of the root in watch mode"),
+    ] = 1.0,
+    compact: Annotated[
+        bool,
+        typer.Option(
+            "--compact",
+            help="write json without indentation and without the defaults JOJ3 fills in itself",
+        ),
+    ] = False,
+    profile: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="write a Chrome trace event json of the run to this path and log a summary",
+        ),
+    ] = None,
+    check: Annotated[
+        bool,
+        typer.Option(
+            "--check",
+            help="write nothing, list the json files that are out of date and exit with 1 if any",
+        ),
+    ] = False,
+    depfile: Annotated[
+        bool,
+        typer.Option(
+            "--depfile",
+            help="write the inputs read for each json to a make style depfile next to it, named <json>.d",
+        ),
+    ] = False,
+    paths: Annotated[
+        Optional[List[Path]],
+        typer.Option(
+            "--paths",
+            help="only convert the tasks affected by these changed files, can be repeated",
+            show_default=False,
+        ),
+    ] = None,
+    since: Annotated[
+        Optional[str],
+        typer.Option(
+            help="only convert the tasks affected by the files changed since this git revision",
+        ),
+    ] = None,
+    output: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--output",
+            "-o",
+            help="directory to write the json files to when the root is an archive, as if it was extracted there, defaults to the current directory",
+            show_default=False,
+        ),
+    ] = None,
 ) -> None:
     """
     Convert given dir of JOJ3 toml config files to JOJ3 json config files
     """
     app.pretty_exceptions_enable = False
     logger.info(f"Converting files in {root.absolute()}")
+    set_hash_cache(default_hash_cache_path() if hash_cache else None)
+    if profile is not None:
+        start_tracing()
+    if watch and (check or paths is not None or since is not None):
+        logger.error("--check, --paths and --since can not be used with --watch")
+        raise typer.Exit(code=1)
+    fs: Optional[FileSystem] = None
+    if root.is_file():
+        if watch or incremental or depfile or paths is not None or since is not None:
+            logger.error(
+                "--watch, --incremental, --depfile, --paths and --since can not be used with an archive"
+            )
+            raise typer.Exit(code=1)
+        from joj3_config_generator.archive import load_archive
+
+        archive_path, root = root, output or Path(".")
+        try:
+            archive_fs = load_archive(archive_path, root)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read archive {archive_path}: {e}")
+            raise typer.Exit(code=1)
+        logger.info(
+            f"Read {len(archive_fs.digests)} file(s) from {archive_path}, writing to {root.absolute()}"
+        )
+        fs = archive_fs
+    elif output is not None:
+        logger.error("--output can only be used with an archive")
+        raise typer.Exit(code=1)
+    if watch:
+        Watcher(root, jobs, compact, depfile).run(interval)
+        if profile is not None:
+            logger.info(f"Trace written to {profile}\n{stop_tracing(profile)}")
+        return
     error_json_paths = []
+    stale_json_paths = []
     is_json_generated = False
-    for repo_toml_path in root.glob("**/repo.toml"):
-        if not any(p != repo_toml_path for p in repo_toml_path.parent.glob("*.toml")):
-            fallback_toml_path = repo_toml_path.parent / "conf.toml"
-            if not fallback_toml_path.exists():
-                fallback_toml_path.write_text(
-                    'name = "health check"\nmax-total-score = 0\n'
-                )
-        for task_toml_path in repo_toml_path.parent.glob("**/*.toml"):
-            if repo_toml_path == task_toml_path:
-                continue
-            if is_toml_empty(task_toml_path):
-                logger.info(f"Skipping empty task toml file {task_toml_path}")
-                continue
-            toml_name = task_toml_path.name.removesuffix(".toml")
-            result_json_path = task_toml_path.parent / f"{toml_name}.json"
-            logger.info(
-                f"Converting {repo_toml_path} & {task_toml_path} to {result_json_path}"
+    written_count = 0
+    unchanged_count = 0
+    index = DirectoryIndex(root, fs)
+    tasks = find_tasks(root, index)
+    manifest = Manifest.load(root, compact) if incremental else None
+    if manifest is not None:
+        # the tasks not selected below are kept in the manifest
+        manifest.prune(tasks)
+    if paths is not None or since is not None:
+        try:
+            changed_paths = get_changed_paths(root, paths, since)
+        except subprocess.CalledProcessError as e:
+            logger.error(
+                f"Failed to get the files changed since {since}: {e.stderr.strip()}"
             )
-            try:
-                repo_conf, task_conf = load_joj3_toml(
-                    root, repo_toml_path, task_toml_path
-                )
-                result_model = convert_joj3_conf(repo_conf, task_conf)
-                result_dict = result_model.model_dump(
-                    mode="json", by_alias=True, exclude_none=True
-                )
-                with result_json_path.open("w", newline="") as result_file:
-                    json.dump(result_dict, result_file, ensure_ascii=False, indent=4)
-                    result_file.write("\n")
-                is_json_generated = True
-            except Exception:
-                error_json_paths.append(result_json_path)
-                continue
-    if error_json_paths:
-        result_model = create_joj3_convert_failure_conf()
-        result_dict = result_model.model_dump(
-            mode="json", by_alias=True, exclude_none=True
+            raise typer.Exit(code=1)
+        except OSError as e:
+            logger.error(f"Failed to run git: {e}")
+            raise typer.Exit(code=1)
+        affected_tasks = select_affected_tasks(tasks, changed_paths)
+        logger.info(
+            f"Selected {len(affected_tasks)} of {len(tasks)} task(s) affected by {len(changed_paths)} changed file(s)"
+        )
+        if tasks:
+            is_json_generated = True
+        tasks = affected_tasks
+    task_count = len(tasks)
+    if manifest is not None:
+        with use_index(index):
+            stale_tasks = [job for job in tasks if not manifest.is_fresh(job)]
+        count("manifest_hit", len(tasks) - len(stale_tasks))
+        count("manifest_miss", len(stale_tasks))
+        if len(stale_tasks) < len(tasks):
+            is_json_generated = True
+            logger.info(f"Skipping {len(tasks) - len(stale_tasks)} unchanged task(s)")
+        tasks = stale_tasks
+    for res in run_tasks(root, tasks, jobs, index, compact=compact):
+        if res.content is None:
+            error_json_paths.append(res.job.result_json_path)
+        else:
+            if check:
+                if is_result_json_fresh(res.job.result_json_path, res.content):
+                    unchanged_count += 1
+                else:
+                    stale_json_paths.append(res.job.result_json_path)
+            elif write_result_json(res.job.result_json_path, res.content):
+                written_count += 1
+            else:
+                unchanged_count += 1
+            is_json_generated = True
+        if depfile and not check:
+            write_depfile(res)
+        if manifest is not None and not check:
+            manifest.update(res)
+    if manifest is not None and not check:
+        manifest.save()
+    if error_json_paths and check:
+        stale_failure_json_paths = check_failure_jsons(error_json_paths, compact)
+        stale_json_paths += stale_failure_json_paths
+        unchanged_count += len(error_json_paths) - len(stale_failure_json_paths)
+    elif error_json_paths:
+        failure_written_count = write_failure_jsons(error_json_paths, compact)
+        written_count += failure_written_count
+        unchanged_count += len(error_json_paths) - failure_written_count
+    if check:
+        logger.info(
+            f"Checked {task_count} file(s), {len(stale_json_paths)} out of date"
+        )
+    else:
+        logger.info(f"Wrote {written_count} file(s), {unchanged_count} unchanged")
+    if profile is not None:
+        logger.info(f"Trace written to {profile}\n{stop_tracing(profile)}")
+    if stale_json_paths:
+        logger.error(
+            f"Out of date: {', '.join(str(json_path) for json_path in stale_json_paths)}. Run convert without --check to update them."
         )
-        for error_json_path in error_json_paths:
-            with error_json_path.open("w", newline="") as result_file:
-                json.dump(result_dict, result_file, ensure_ascii=False, indent=4)
-                result_file.write("\n")
+    if error_json_paths:
         logger.error(
             f"Failed to convert {len(error_json_paths)} file(s): {', '.join(str(json_path) for json_path in error_json_paths)}. Check previous errors for details."
         )
         raise typer.Exit(code=1)
+    if stale_json_paths:
+        raise typer.Exit(code=1)
     if not is_json_generated:
         logger.error("No repo.toml files found to convert.")
         raise typer.Exit(code=1)
+
+
+@app.command()
+def serve(
+    root: Annotated[
+        Path,
+        typer.Argument(help="default root directory of config files of requests"),
+    ] = Path("."),
+    socket_path: Annotated[
+        Path,
+        typer.Option("--socket", help="path of the unix socket to listen on"),
+    ] = Path("joj3-forge.sock"),
+    port: Annotated[
+        Optional[int],
+        typer.Option(
+            help="listen on this port of localhost instead of the unix socket",
+            show_default=False,
+        ),
+    ] = None,
+    max_concurrency: Annotated[
+        int,
+        typer.Option(min=1, help="number of requests handled at the same time"),
+    ] = 4,
+    max_roots: Annotated[
+        int,
+        typer.Option(
+            min=1, help="number of roots kept in memory, least recently used first out"
+        ),
+    ] = 8,
+    hash_cache: Annotated[
+        bool,
+        typer.Option(
+            help=f"cache sha256 of immutable files in {default_hash_cache_path()}",
+        ),
+    ] = True,
+) -> None:
+    """
+    Keep converted configs in memory and answer convert and validate requests,
+    one json object per line, reconverting only the tasks whose files changed
+    """
+    from joj3_config_generator.serve import ConvertService
+    from joj3_config_generator.serve import serve as serve_requests
+
+    app.pretty_exceptions_enable = False
+    set_hash_cache(default_hash_cache_path() if hash_cache else None)
+    service = ConvertService(root, max_roots, max_concurrency)
+    serve_requests(service, socket_path, port)
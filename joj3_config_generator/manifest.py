@@ -0,0 +1,139 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from joj3_config_generator import get_version
+from joj3_config_generator.batch import TaskJob, TaskResult
+from joj3_config_generator.transformers.repo import calc_sha256sum
+from joj3_config_generator.utils import index
+from joj3_config_generator.utils.deps import FileStat, hash_listing, stat_file
+from joj3_config_generator.utils.logger import logger
+
+MANIFEST_FILENAME = ".joj3-forge-cache.json"
+
+
+def get_context(compact: bool = False) -> Dict[str, Any]:
+    # things outside the toml files that change the generated configs
+    return {
+        "version": get_version(),
+        "course": os.getenv("COURSE"),
+        "cwd": Path.cwd().name,
+        "compact": compact,
+    }
+
+
+class Manifest:
+    """
+    Input hashes of every generated json under a root, used to skip the tasks
+    whose inputs did not change since the last run.
+    """
+
+    def __init__(
+        self, root: Path, entries: Dict[str, Any], compact: bool = False
+    ) -> None:
+        self.root = root
+        self.entries = entries
+        self.compact = compact
+
+    @property
+    def path(self) -> Path:
+        return self.root / MANIFEST_FILENAME
+
+    @classmethod
+    def load(cls, root: Path, compact: bool = False) -> "Manifest":
+        manifest_path = root / MANIFEST_FILENAME
+        try:
+            data = json.loads(manifest_path.read_text())
+        except FileNotFoundError:
+            return cls(root, {}, compact)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring broken cache file {manifest_path}: {e}")
+            return cls(root, {}, compact)
+        if not isinstance(data, dict) or data.get("context") != get_context(compact):
+            logger.info(f"Ignoring outdated cache file {manifest_path}")
+            return cls(root, {}, compact)
+        return cls(root, data.get("entries", {}), compact)
+
+    def save(self) -> None:
+        data = {"context": get_context(self.compact), "entries": self.entries}
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def rel(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def is_file_fresh(self, path: Path, entry: Optional[Dict[str, Any]]) -> bool:
+        stat = stat_file(path)
+        if entry is None or stat is None:
+            return entry is None and stat is None
+        if stat == (entry["size"], entry["mtime"]):
+            return True
+        if stat[0] != entry["size"] or calc_sha256sum(path) != entry["sha256"]:
+            return False
+        # touched but not modified
+        entry["mtime"] = stat[1]
+        return True
+
+    def is_fresh(self, job: TaskJob) -> bool:
+        entry = self.entries.get(self.rel(job.result_json_path))
+        if entry is None:
+            return False
+        # a repo.toml added or removed on the way attributes it to another repo
+        if entry.get("repo") != self.rel(job.repo_toml_path):
+            return False
+        if not self.is_file_fresh(job.result_json_path, entry["output"]):
+            return False
+        for rel_path, file_entry in entry["files"].items():
+            if not self.is_file_fresh(self.root / rel_path, file_entry):
+                return False
+        for key, listing_hash in entry["globs"].items():
+            rel_dir, pattern = key.split("|", 1)
+            base_dir = self.root / rel_dir
+            if hash_listing(self.root, index.glob(base_dir, pattern)) != listing_hash:
+                return False
+        return True
+
+    def file_entry(
+        self, path: Path, stat: Optional[FileStat], sha256: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        if stat is None:
+            return None
+        return {
+            "size": stat[0],
+            "mtime": stat[1],
+            "sha256": sha256 or calc_sha256sum(path),
+        }
+
+    def update(self, res: TaskResult) -> None:
+        key = self.rel(res.job.result_json_path)
+        if res.content is None or res.deps is None:
+            self.entries.pop(key, None)
+            return
+        files = {}
+        for path, stat in res.deps.files.items():
+            if stat_file(path) != stat:
+                # changed during the conversion, convert again next time
+                self.entries.pop(key, None)
+                return
+            files[self.rel(path)] = self.file_entry(
+                path, stat, res.deps.digests.get(path)
+            )
+        globs = {
+            f"{self.rel(base_dir)}|{pattern}": hash_listing(self.root, matches)
+            for (base_dir, pattern), matches in res.deps.globs.items()
+        }
+        output_path = res.job.result_json_path
+        self.entries[key] = {
+            "repo": self.rel(res.job.repo_toml_path),
+            "output": self.file_entry(output_path, stat_file(output_path)),
+            "files": files,
+            "globs": globs,
+        }
+
+    def prune(self, jobs: List[TaskJob]) -> None:
+        keys = {self.rel(job.result_json_path) for job in jobs}
+        for key in list(self.entries):
+            if key not in keys:
+                del self.entries[key]
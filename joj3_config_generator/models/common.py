@@ -1,22 +1,34 @@
+from functools import lru_cache
 from typing import Union
 
 import humanfriendly
 from pydantic import BaseModel, ConfigDict
 
+# distinct size and timespan strings kept parsed, a course uses only a few
+PARSE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_memory(value: str) -> int:
+    return int(humanfriendly.parse_size(value, binary=True))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_time(value: str) -> int:
+    return round(humanfriendly.parse_timespan(value) * 1_000_000_000)  # ns
+
 
 class Memory(int):
     def __new__(cls, value: Union[str, int]) -> "Memory":
         if isinstance(value, str):
-            parsed = humanfriendly.parse_size(value, binary=True)
-            return super().__new__(cls, parsed)
+            return super().__new__(cls, parse_memory(value))
         return super().__new__(cls, value)
 
 
 class Time(int):
     def __new__(cls, value: Union[str, int]) -> "Time":
         if isinstance(value, str):
-            parsed = humanfriendly.parse_timespan(value) * 1_000_000_000  # ns
-            return super().__new__(cls, round(parsed))
+            return super().__new__(cls, parse_time(value))
         return super().__new__(cls, value)
 
 
@@ -1,8 +1,14 @@
 import os
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Dict, List
 
-from pydantic import AliasChoices, Field, field_validator, model_validator
+from pydantic import (
+    AliasChoices,
+    Field,
+    PrivateAttr,
+    field_validator,
+    model_validator,
+)
 
 from joj3_config_generator.models.common import Memory, StrictBaseModel
 
@@ -107,6 +113,9 @@ class Config(StrictBaseModel):
         HealthCheck(), validation_alias=AliasChoices("health-check", "health_check")
     )
 
+    # values derived from this config only, shared by all the tasks of the repo
+    _cache: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
     @model_validator(mode="after")
     def set_grading_repo_name_from_cwd(self) -> "Config":
         if not self.grading_repo_name:
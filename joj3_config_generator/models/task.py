@@ -4,7 +4,14 @@ from enum import Enum
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Type
 
-from pydantic import AliasChoices, ConfigDict, Field, field_validator, model_validator
+from pydantic import (
+    AliasChoices,
+    ConfigDict,
+    Field,
+    ValidationError,
+    field_validator,
+    model_validator,
+)
 
 from joj3_config_generator.models.common import Memory, StrictBaseModel, Time
 from joj3_config_generator.models.const import (
@@ -227,13 +234,27 @@ class Stage(Case):
     def gather_cases(cls: Type["Stage"], values: Dict[str, Any]) -> Dict[str, Any]:
         cases = {k: v for k, v in values.items() if k.startswith("case")}
         limit = values.get("limit", {})
+        # validate the stage limit once and share it with the cases that do
+        # not override it, on errors leave it to the field validation
+        shared_limit: Optional[Limit] = None
+        try:
+            shared_limit = Limit.model_validate(limit)
+        except ValidationError:
+            pass
         parsed_cases = {}
         for key, case in cases.items():
-            case_with_limit = {**limit, **case.get("limit", {})}
+            case_limit = case.get("limit", {})
+            case_with_limit: Any = shared_limit
+            if shared_limit is None or case_limit:
+                case_with_limit = {**limit, **case_limit}
             case_for_parsing = {**case, "limit": case_with_limit}
             parsed_cases[key] = case_for_parsing
             values.pop(key)
         values["cases"] = parsed_cases
+        if shared_limit is not None and "limit" in values:
+            # the raw limit is kept in values, it is checked for unnecessary
+            # fields after the validation
+            return {**values, "limit": shared_limit}
         return values
 
 
@@ -0,0 +1,272 @@
+import json
+import signal
+import socketserver
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type
+
+from joj3_config_generator.affected import absolute
+from joj3_config_generator.batch import (
+    TaskJob,
+    TaskResult,
+    find_tasks,
+    get_log_entry,
+    run_tasks,
+)
+from joj3_config_generator.loader import load_joj3_repo_toml, load_joj3_task_toml
+from joj3_config_generator.utils.logger import logger
+from joj3_config_generator.watch import Watcher
+
+if TYPE_CHECKING:
+    from loguru import Message
+
+# log entries of the request handled in the current thread
+_request_logs: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar(
+    "joj3_request_logs", default=None
+)
+
+
+def collect_request_log(message: "Message") -> None:
+    logs = _request_logs.get()
+    if logs is not None:
+        logs.append(get_log_entry(message))
+
+
+class Session:
+    """
+    Warm state of a convert root: its tasks, the parsed repo configs with the
+    hashes of their immutable files, and the converted results. Everything
+    is kept until the files it was built from change, which is checked by a
+    poll of the root on every request.
+    """
+
+    def __init__(self, root: Path, compact: bool = False) -> None:
+        self.root = root
+        self.compact = compact
+        self.watcher = Watcher(root, jobs=1, compact=compact)
+        self.watcher.tasks = find_tasks(root, self.watcher.index)
+        self.results: Dict[TaskJob, TaskResult] = {}
+        self.lock = threading.Lock()
+
+    def refresh(self) -> None:
+        changed = self.watcher.poll()
+        if not changed:
+            return
+        for job in self.watcher.refresh(changed):
+            self.results.pop(job, None)
+        for job in set(self.results) - set(self.watcher.tasks):
+            del self.results[job]
+
+    def select(self, task_paths: Optional[List[Path]]) -> List[TaskJob]:
+        if task_paths is None:
+            return list(self.watcher.tasks)
+        wanted = {absolute(self.root / task_path) for task_path in task_paths}
+        jobs = [
+            job for job in self.watcher.tasks if absolute(job.task_toml_path) in wanted
+        ]
+        if len(jobs) < len(wanted):
+            found = {absolute(job.task_toml_path) for job in jobs}
+            unknown = ", ".join(str(path) for path in sorted(wanted - found))
+            raise ValueError(f"Unknown task toml file(s): {unknown}")
+        return jobs
+
+    def convert(self, task_paths: Optional[List[Path]] = None) -> List[TaskResult]:
+        """
+        Results of the given task tomls, or of every task, converting only
+        those not cached. The logs of each result are the ones of its last
+        conversion.
+        """
+        with self.lock:
+            self.refresh()
+            jobs = self.select(task_paths)
+            stale_jobs = [job for job in jobs if job not in self.results]
+            logs: List[Dict[str, Any]] = []
+            token = _request_logs.set(logs)
+            try:
+                for res in run_tasks(
+                    self.root,
+                    stale_jobs,
+                    1,
+                    self.watcher.index,
+                    self.watcher.repo_confs,
+                    self.compact,
+                ):
+                    self.results[res.job] = res._replace(logs=list(logs))
+                    self.watcher.deps[res.job] = res.deps
+                    logs.clear()
+            finally:
+                _request_logs.reset(token)
+            return [self.results[job] for job in jobs]
+
+    def validate(
+        self, task_paths: Optional[List[Path]] = None
+    ) -> List[Tuple[TaskJob, bool, List[Dict[str, Any]]]]:
+        """
+        Load the repo and task tomls of the given tasks, or of every task,
+        without converting them. Return whether each is valid and its logs.
+        """
+        with self.lock:
+            self.refresh()
+            jobs = self.select(task_paths)
+        validated = []
+        for job in jobs:
+            logs: List[Dict[str, Any]] = []
+            token = _request_logs.set(logs)
+            try:
+                load_joj3_repo_toml(self.root, job.repo_toml_path)
+                load_joj3_task_toml(self.root, job.task_toml_path)
+                valid = True
+            except Exception:
+                valid = False
+            finally:
+                _request_logs.reset(token)
+            validated.append((job, valid, logs))
+        return validated
+
+
+def format_logs(logs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    return [{"level": log["level"], "message": log["message"]} for log in logs]
+
+
+class ConvertService:
+    """
+    Handle convert and validate requests, with a session for each of the
+    most recently used roots and a bound on the requests handled at once.
+    """
+
+    def __init__(
+        self, root: Path, max_sessions: int = 8, max_concurrency: int = 4
+    ) -> None:
+        self.root = root
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[Tuple[Path, bool], Session]" = OrderedDict()
+        self.sessions_lock = threading.Lock()
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def get_session(self, root: Path, compact: bool) -> Session:
+        key = (absolute(root), compact)
+        with self.sessions_lock:
+            session = self.sessions.pop(key, None)
+            if session is None:
+                logger.info(f"Loading {root}")
+                session = Session(root, compact)
+            self.sessions[key] = session
+            while len(self.sessions) > self.max_sessions:
+                (evicted_root, _), _ = self.sessions.popitem(last=False)
+                logger.info(f"Evicted {evicted_root} from the cache")
+        return session
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Requests are json objects like
+        {"command": "convert", "root": ".", "tasks": ["hw1/task.toml"]},
+        where command is "convert" or "validate", root defaults to the root
+        the service is started with, and all tasks are handled if tasks is
+        not given. "compact": true works as convert --compact.
+        """
+        command = request.get("command")
+        if command not in ["convert", "validate"]:
+            return {"ok": False, "error": f"Unknown command {command}"}
+        task_paths = request.get("tasks")
+        results: List[Dict[str, Any]]
+        with self.semaphore:
+            try:
+                session = self.get_session(
+                    Path(request.get("root", self.root)),
+                    bool(request.get("compact", False)),
+                )
+                paths = None if task_paths is None else [Path(p) for p in task_paths]
+                if command == "convert":
+                    results = [
+                        {
+                            "task": str(res.job.task_toml_path),
+                            "output": str(res.job.result_json_path),
+                            "content": res.content,
+                            "logs": format_logs(res.logs),
+                        }
+                        for res in session.convert(paths)
+                    ]
+                    ok = all(result["content"] is not None for result in results)
+                else:
+                    validated = session.validate(paths)
+                    results = [
+                        {
+                            "task": str(job.task_toml_path),
+                            "valid": valid,
+                            "logs": format_logs(logs),
+                        }
+                        for job, valid, logs in validated
+                    ]
+                    ok = all(valid for _, valid, _ in validated)
+            except Exception as e:
+                logger.error(f"Failed to handle {request}: {e}")
+                return {"ok": False, "error": str(e)}
+        return {"ok": ok, "results": results}
+
+
+def make_handler(service: ConvertService) -> Type[socketserver.StreamRequestHandler]:
+    class RequestHandler(socketserver.StreamRequestHandler):
+        # one json request per line, answered by one json response per line
+        def handle(self) -> None:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a json object")
+                except ValueError as e:
+                    response: Dict[str, Any] = {
+                        "ok": False,
+                        "error": f"Invalid request: {e}",
+                    }
+                else:
+                    response = service.handle(request)
+                self.wfile.write(
+                    (json.dumps(response, ensure_ascii=False) + "\n").encode()
+                )
+
+    return RequestHandler
+
+
+class UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(
+    service: ConvertService, socket_path: Optional[Path], port: Optional[int]
+) -> socketserver.BaseServer:
+    """
+    Listen on socket_path, or on localhost:port if port is given.
+    """
+    handler = make_handler(service)
+    if port is not None:
+        return TCPServer(("127.0.0.1", port), handler)
+    assert socket_path is not None
+    socket_path.unlink(missing_ok=True)
+    return UnixServer(str(socket_path), handler)
+
+
+def serve(
+    service: ConvertService, socket_path: Optional[Path], port: Optional[int]
+) -> None:
+    # stop on SIGTERM the same way as on Ctrl-C, so that the socket is removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    handler_id = logger.add(collect_request_log, level="WARNING")
+    server = make_server(service, socket_path, port)
+    address = f"127.0.0.1:{port}" if port is not None else socket_path
+    logger.info(f"Serving {service.root.absolute()} on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopped serving")
+    finally:
+        server.server_close()
+        logger.remove(handler_id)
+        if port is None and socket_path is not None:
+            socket_path.unlink(missing_ok=True)
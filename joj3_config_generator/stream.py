@@ -0,0 +1,177 @@
+import json
+import secrets
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, cast
+
+from pydantic_core import to_jsonable_python
+
+from joj3_config_generator.compact import (
+    compact_case,
+    compact_diff_output,
+    compact_result_dict,
+    iter_stages,
+)
+from joj3_config_generator.models import result
+from joj3_config_generator.utils.serialize import dumps_json
+
+# cases dumped and serialized at a time, which bounds the intermediate dicts
+STREAM_BATCH_SIZE = 1000
+
+
+class CaseList(NamedTuple):
+    cases: List[Any]
+    # dump a batch of cases to json compatible dicts
+    dump: Callable[[List[Any]], List[Dict[str, Any]]]
+    # strip the defaults from a dumped case, None if not compact
+    compact: Optional[Callable[[Dict[str, Any]], None]]
+
+
+def dump_cmds(cmds: List[result.OptionalCmd]) -> List[Dict[str, Any]]:
+    return [
+        cmd.model_dump(mode="json", by_alias=True, exclude_none=True) for cmd in cmds
+    ]
+
+
+def dump_diff_cases(cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return list(to_jsonable_python(cases, by_alias=True, exclude_none=True))
+
+
+def compact_diff_case(case: Dict[str, Any]) -> None:
+    for output in case.get("outputs", []):
+        compact_diff_output(output)
+
+
+def get_parser_with(parser: result.Parser) -> Dict[str, Any]:
+    # parser configs are kept as dicts, see result.Parser.validate_with
+    return cast(Dict[str, Any], parser.with_)
+
+
+def get_stage_models(result_model: result.Config) -> List[result.StageDetail]:
+    # in the order of compact.STAGE_GROUPS
+    return [*result_model.pre_stages, *result_model.stages, *result_model.post_stages]
+
+
+class DetachedCases(NamedTuple):
+    stage_index: int
+    # index of the diff parser, None for the executor
+    parser_index: Optional[int]
+    cases: List[Any]
+
+
+@contextmanager
+def detach_cases(result_model: result.Config) -> Iterator[List[DetachedCases]]:
+    """
+    Empty the case lists of the executors and the diff parsers while in the
+    block, so the rest of result_model can be dumped without them.
+    """
+    detached: List[DetachedCases] = []
+    stages = get_stage_models(result_model)
+    try:
+        for stage_index, stage in enumerate(stages):
+            detached.append(
+                DetachedCases(stage_index, None, stage.executor.with_.cases)
+            )
+            stage.executor.with_.cases = []
+            for parser_index, parser in enumerate(stage.parsers):
+                parser_with = get_parser_with(parser)
+                if parser.name == "diff" and "cases" in parser_with:
+                    detached.append(
+                        DetachedCases(stage_index, parser_index, parser_with["cases"])
+                    )
+                    parser_with["cases"] = []
+        yield detached
+    finally:
+        for detached_cases in detached:
+            stage = stages[detached_cases.stage_index]
+            if detached_cases.parser_index is None:
+                stage.executor.with_.cases = detached_cases.cases
+            else:
+                parser = stage.parsers[detached_cases.parser_index]
+                get_parser_with(parser)["cases"] = detached_cases.cases
+
+
+def iter_cases_json(case_list: CaseList, indent: Optional[str]) -> Iterator[str]:
+    """
+    Serialize the cases in batches as the items of a json list, which starts
+    on a line indented by indent, or in compact form if indent is None.
+    """
+    cases = case_list.cases
+    for start in range(0, len(cases), STREAM_BATCH_SIZE):
+        batch = case_list.dump(cases[start : start + STREAM_BATCH_SIZE])
+        if case_list.compact is not None:
+            for case in batch:
+                case_list.compact(case)
+        if indent is None:
+            # "[{...},{...}]\n"
+            yield ("," if start else "") + dumps_json(batch, compact=True)[1:-2]
+        else:
+            # "[\n    {\n        ...\n    }\n]\n"
+            items = dumps_json(batch)[2:-3]
+            yield (",\n" if start else "") + indent + items.replace("\n", "\n" + indent)
+
+
+def iter_result_json(
+    result_model: result.Config, compact: bool = False
+) -> Iterator[str]:
+    """
+    Serialize result_model to the same json as dumps_json on its dump,
+    compacted by compact_result_dict if compact. The cases of the executors
+    and the diff parsers are dumped and serialized in batches as the output
+    is consumed, instead of all in one dict.
+    """
+    with detach_cases(result_model) as detached:
+        result_dict = result_model.model_dump(
+            mode="json", by_alias=True, exclude_none=True
+        )
+    stage_dicts = iter_stages(result_dict)
+    # cases are compared with the default cmd as it is before compacting
+    default_cmds = [dict(stage["executor"]["with"]["default"]) for stage in stage_dicts]
+    if compact:
+        compact_result_dict(result_dict)
+    token = secrets.token_hex(8)
+    case_lists: Dict[str, CaseList] = {}
+    for stage_index, parser_index, cases in detached:
+        if not cases:
+            continue
+        placeholder = f"{token}-{len(case_lists)}"
+        stage_dict = stage_dicts[stage_index]
+        if parser_index is None:
+            stage_dict["executor"]["with"]["cases"] = placeholder
+            case_list = CaseList(
+                cases,
+                dump_cmds,
+                (
+                    partial(compact_case, default_cmd=default_cmds[stage_index])
+                    if compact
+                    else None
+                ),
+            )
+        else:
+            stage_dict["parsers"][parser_index]["with"]["cases"] = placeholder
+            case_list = CaseList(
+                cases, dump_diff_cases, compact_diff_case if compact else None
+            )
+        case_lists[json.dumps(placeholder)] = case_list
+    content = dumps_json(result_dict, compact)
+    pos = 0
+    for placeholder, case_list in case_lists.items():
+        placeholder_pos = content.index(placeholder, pos)
+        yield content[pos:placeholder_pos]
+        if compact:
+            yield "["
+            yield from iter_cases_json(case_list, None)
+            yield "]"
+        else:
+            line_start = content.rfind("\n", 0, placeholder_pos) + 1
+            line = content[line_start:placeholder_pos]
+            indent = line[: len(line) - len(line.lstrip(" "))]
+            yield "[\n"
+            yield from iter_cases_json(case_list, indent)
+            yield "\n" + indent + "]"
+        pos = placeholder_pos + len(placeholder)
+    yield content[pos:]
+
+
+def dump_result_model(result_model: result.Config, compact: bool = False) -> str:
+    return "".join(iter_result_json(result_model, compact))
@@ -1,6 +1,11 @@
 import hashlib
+import io
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from joj3_config_generator.models import common, repo, result, task
 from joj3_config_generator.models.const import (
@@ -8,8 +13,16 @@ from joj3_config_generator.models.const import (
     TEAPOT_CONFIG_ROOT,
     TEAPOT_LOG_PATH,
 )
+from joj3_config_generator.utils import deps, tracing
+from joj3_config_generator.utils.fs import FileSystem, get_fs, use_cached_fs
+from joj3_config_generator.utils.hashcache import get_hash_cache
 from joj3_config_generator.utils.logger import logger
 
+# files at least this large are hashed from a memory map instead of a read loop
+MMAP_THRESHOLD = 4 * 1024 * 1024
+# less than this in total is hashed faster than a thread pool starts
+THREAD_POOL_MIN_BYTES = 1024 * 1024
+
 
 def get_teapot_env() -> List[str]:
     return [
@@ -105,23 +118,56 @@ def get_teapot_post_stage(
     return stage_conf
 
 
-def get_check_lists(repo_conf: repo.Config) -> Tuple[List[str], List[str]]:
+def get_immutable_dir(repo_conf: repo.Config) -> Path:
     base_dir = (repo_conf.root / repo_conf.path).parent
-    immutable_dir = base_dir / repo_conf.health_check.immutable_path
-    file_sums = []
-    file_paths = []
-    for file_path in sorted(immutable_dir.glob("**/*")):
-        if file_path.is_dir():
-            continue
-        if not file_path.exists():
+    return base_dir / repo_conf.health_check.immutable_path
+
+
+def get_check_lists(repo_conf: repo.Config) -> Tuple[List[str], List[str]]:
+    # each file is stat'ed to be listed, hashed and recorded, once on the disk
+    with use_cached_fs():
+        return build_check_lists(repo_conf)
+
+
+def build_check_lists(repo_conf: repo.Config) -> Tuple[List[str], List[str]]:
+    immutable_dir = get_immutable_dir(repo_conf)
+    fs = get_fs()
+    immutable_files = []
+    for file_path in sorted(deps.glob(immutable_dir, "**/*")):
+        # listed entries exist, but a broken symlink does not stat
+        st = fs.stat(file_path)
+        if st is None:
             logger.warning(f"Immutable file not found: {file_path}")
             continue
-        file_sums.append(calc_sha256sum(file_path))
-        file_paths.append(file_path.relative_to(immutable_dir).as_posix())
+        if st.is_dir:
+            continue
+        immutable_files.append(file_path)
+    file_sums = get_file_sha256sums(immutable_files)
+    file_paths = []
+    # the matches are under immutable_dir, which is faster than relative_to
+    base_parts_count = len(immutable_dir.parts)
+    for file_path, file_sum in zip(immutable_files, file_sums):
+        deps.record_file(file_path, file_sum)
+        file_paths.append("/".join(file_path.parts[base_parts_count:]))
     return file_sums, file_paths
 
 
 def get_health_check_args(repo_conf: repo.Config) -> List[str]:
+    # hashing the immutable files is done once per repo, and the inputs read
+    # are added again to the dependencies of every task using them
+    if "health_check_args" not in repo_conf._cache:
+        tracing.count("health_check_cache_miss")
+        with deps.track_dependencies() as health_check_deps:
+            args = build_health_check_args(repo_conf)
+        repo_conf._cache["health_check_args"] = (args, health_check_deps)
+    else:
+        tracing.count("health_check_cache_hit")
+    args, health_check_deps = repo_conf._cache["health_check_args"]
+    deps.merge_dependencies(health_check_deps)
+    return list(args)
+
+
+def build_health_check_args(repo_conf: repo.Config) -> List[str]:
     file_sums, file_paths = get_check_lists(repo_conf)
     args = [
         "/usr/local/bin/repo-health-checker",
@@ -215,9 +261,86 @@ def get_health_check_stage(
     return health_check_stage
 
 
-def calc_sha256sum(file_path: Path) -> str:
+def get_file_sha256sums(
+    file_paths: List[Path], max_workers: Optional[int] = None
+) -> List[str]:
+    """
+    Hash files in a thread pool, as hashlib releases the GIL. Digests found in
+    the hash cache are not computed again. The order of file_paths is kept.
+    """
+    with tracing.span("hash", files=len(file_paths)):
+        return hash_file_paths(file_paths, max_workers)
+
+
+def hash_file_paths(file_paths: List[Path], max_workers: Optional[int]) -> List[str]:
+    hash_cache = get_hash_cache()
+    # the worker threads do not see the file system of the context
+    fs = get_fs()
+    # cached by the file system, and used again to record the dependencies
+    stats = [fs.stat(file_path) for file_path in file_paths]
+    # digests the file system already knows, e.g. of archive members
+    file_sums = [fs.get_sha256(file_path) for file_path in file_paths]
+    if hash_cache is not None:
+        file_sums = [
+            (
+                hash_cache.get(file_path, st)
+                if file_sum is None and st is not None
+                else file_sum
+            )
+            for file_path, st, file_sum in zip(file_paths, stats, file_sums)
+        ]
+    missing = [i for i, file_sum in enumerate(file_sums) if file_sum is None]
+    if hash_cache is not None:
+        tracing.count("hash_cache_hit", len(file_paths) - len(missing))
+        tracing.count("hash_cache_miss", len(missing))
+    missing_bytes = sum(st.st_size for st in (stats[i] for i in missing) if st)
+    tracing.count("hash_files", len(missing))
+    tracing.count("hash_bytes", missing_bytes)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if len(missing) > 1 and max_workers > 1 and missing_bytes >= THREAD_POOL_MIN_BYTES:
+        # hash in chunks to keep the per-call overhead low for small files
+        chunk_size = max(1, len(missing) // (max_workers * 4))
+        chunks = [
+            [file_paths[i] for i in missing[start : start + chunk_size]]
+            for start in range(0, len(missing), chunk_size)
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            missing_sums = [
+                file_sum
+                for chunk_sums in executor.map(partial(calc_sha256sums, fs=fs), chunks)
+                for file_sum in chunk_sums
+            ]
+    else:
+        missing_sums = calc_sha256sums([file_paths[i] for i in missing], fs)
+    for i, file_sum in zip(missing, missing_sums):
+        file_sums[i] = file_sum
+        st = stats[i]
+        if hash_cache is not None and st is not None:
+            hash_cache.put(file_paths[i], st, file_sum)
+    if hash_cache is not None:
+        hash_cache.flush()
+    return [file_sum for file_sum in file_sums if file_sum is not None]
+
+
+def calc_sha256sums(
+    file_paths: List[Path], fs: Optional[FileSystem] = None
+) -> List[str]:
+    return [calc_sha256sum(file_path, fs) for file_path in file_paths]
+
+
+def calc_sha256sum(file_path: Path, fs: Optional[FileSystem] = None) -> str:
     sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(64 * 1024), b""):
-            sha256_hash.update(byte_block)
+    if fs is None:
+        fs = get_fs()
+    with fs.open(file_path) as f:
+        if (
+            isinstance(f, io.BufferedReader)
+            and os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD
+        ):
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sha256_hash.update(mm)
+        else:
+            for byte_block in iter(lambda: f.read(64 * 1024), b""):
+                sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
@@ -2,13 +2,14 @@ import re
 import shlex
 from functools import partial
 from pathlib import Path, PurePosixPath
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from natsort import natsorted
 
 from joj3_config_generator.models import result, task
 from joj3_config_generator.models.common import StrictBaseModel
 from joj3_config_generator.models.const import DEFAULT_PATH_ENV, JOJ3_CONFIG_ROOT
+from joj3_config_generator.utils import deps, tracing
 from joj3_config_generator.utils.logger import logger
 
 
@@ -26,26 +27,33 @@ def get_conf_stage(
             groups = [match.group(1)]
         else:
             groups = []
-    conf_stage = result.StageDetail(
-        name=task_stage.name,
-        groups=groups,
-        executor=result.Executor(
-            name="sandbox",
-            with_=get_executor_with(task_stage, cached),
-        ),
-        parsers=([result.Parser(name=parser) for parser in task_stage.parsers]),
-    )
-    parser_handler_map = get_parser_handler_map(
-        task_stage,
-        conf_stage.executor,
-        task_conf.root,
-        task_conf.path,
-    )
-    for idx, parser in enumerate(task_stage.parsers):
-        if parser not in parser_handler_map:
-            raise ValueError(f"Unknown parser {parser}")
-        fn, parser_model = parser_handler_map[parser]
-        fn(parser_model, conf_stage.parsers[idx])
+    with tracing.span(
+        "stage", cat="stage", task=str(task_conf.path), stage=task_stage.name
+    ) as span_args:
+        with tracing.span("executor"):
+            executor_with = get_executor_with(task_stage, cached)
+        conf_stage = result.StageDetail(
+            name=task_stage.name,
+            groups=groups,
+            executor=result.Executor(
+                name="sandbox",
+                with_=executor_with,
+            ),
+            parsers=([result.Parser(name=parser) for parser in task_stage.parsers]),
+        )
+        parser_handler_map = get_parser_handler_map(
+            task_stage,
+            conf_stage.executor,
+            task_conf.root,
+            task_conf.path,
+        )
+        for idx, parser in enumerate(task_stage.parsers):
+            if parser not in parser_handler_map:
+                raise ValueError(f"Unknown parser {parser}")
+            fn, parser_model = parser_handler_map[parser]
+            with tracing.span(f"parser {parser.value}"):
+                fn(parser_model, conf_stage.parsers[idx])
+        span_args["cases"] = len(conf_stage.executor.with_.cases)
     return conf_stage
 
 
@@ -203,6 +211,13 @@ def fix_file(file_parser_config: task.ParserFile, file_parser: result.Parser) ->
     file_parser.with_ = result.FileConfig(name=file_parser_config.name)
 
 
+def get_case_dir(task_root: Path, task_path: Path, task_stage: task.Stage) -> Path:
+    """
+    The directory searched for the .in and .out files of a diff stage.
+    """
+    return (task_root / task_path).parent / task_stage.base_case_dir
+
+
 def fix_diff(
     _: task.ParserDiff,
     diff_parser: result.Parser,
@@ -213,9 +228,10 @@ def fix_diff(
 ) -> None:
     base_dir = JOJ3_CONFIG_ROOT / task_path.parent
     case_base_dir = Path(task_stage.base_case_dir)
+    case_index = CaseIndex(get_case_dir(task_root, task_path, task_stage))
     # cases not specified in the toml config (auto-detected)
     unspecified_cases = get_unspecified_cases(
-        task_root, task_path, case_base_dir, task_stage.cases
+        task_root, task_path, case_base_dir, task_stage.cases, case_index
     )
     # cases specified in toml config but not skipped
     specified_cases = task_stage.cases
@@ -225,7 +241,7 @@ def fix_diff(
     for case_name in specified_cases:
         case = task_stage.cases[case_name]
         stdin, stdout = get_stdin_stdout(
-            task_root, task_path, case_base_dir, case_name, case
+            task_root, task_path, case_base_dir, case_name, case, case_index
         )
         if stdout is None:
             logger.warning(
@@ -302,20 +318,61 @@ def fix_diff(
     diff_parser.with_ = result.DiffConfig(name="diff", cases=parser_cases)
 
 
+class CaseIndex:
+    """
+    The .in and .out files under the case directory of a stage, listed once
+    and shared by the lookups of all its cases.
+    """
+
+    def __init__(self, base_dir: Path) -> None:
+        self.base_dir = base_dir
+        self.in_paths = deps.glob(base_dir, "**/*.in")
+        self.out_paths = deps.glob(base_dir, "**/*.out")
+        self.out_path_set = set(self.out_paths)
+        self.out_by_name: Dict[str, Path] = {}
+        self.out_by_rel_path: Dict[PurePosixPath, Path] = {}
+        # of the .out files with the same name, the one closest to base_dir
+        # wins, then the first by relative path, whatever the listing order
+        for out_path in sorted(self.out_paths, key=self.get_out_order, reverse=True):
+            self.out_by_name[out_path.name] = out_path
+            self.out_by_rel_path[PurePosixPath(out_path.relative_to(base_dir))] = (
+                out_path
+            )
+
+    def get_out_order(self, out_path: Path) -> Tuple[int, Tuple[str, ...]]:
+        rel_parts = out_path.relative_to(self.base_dir).parts
+        return len(rel_parts), rel_parts
+
+    def has_out(self, out_path: Path) -> bool:
+        deps.record_file(out_path)
+        return out_path in self.out_path_set
+
+    def find_out(self, case_name: str, case: task.Case) -> Optional[Path]:
+        if not case.out_:  # if not set, look for .out files with case name
+            return self.out_by_name.get(f"{case_name}.out")
+        # if set, look for .out files with the same relative path
+        return self.out_by_rel_path.get(PurePosixPath(case.out_))
+
+
 def get_unspecified_cases(
-    task_root: Path, task_path: Path, case_base_dir: Path, cases: Dict[str, task.Case]
+    task_root: Path,
+    task_path: Path,
+    case_base_dir: Path,
+    cases: Dict[str, task.Case],
+    case_index: Optional[CaseIndex] = None,
 ) -> Set[str]:
+    if case_index is None:
+        case_index = CaseIndex((task_root / task_path).parent / case_base_dir)
     testcases = set()
-    for testcases_path in ((task_root / task_path).parent / case_base_dir).glob(
-        "**/*.in"
-    ):
-        if not testcases_path.with_suffix(".out").exists():
+    for testcases_path in case_index.in_paths:
+        if not case_index.has_out(testcases_path.with_suffix(".out")):
             logger.warning(
                 f"In file {task_root / task_path}, "
                 f"testcase {testcases_path} has no corresponding .out file, "
                 "skipped"
             )
             continue
+        deps.record_file(testcases_path)
         testcases.add(
             str(
                 PurePosixPath(
@@ -323,9 +380,29 @@ def get_unspecified_cases(
                 )
             ).removesuffix(".in")
         )
-    return testcases.difference(
-        casei for casei in testcases if any(casei.endswith(casej) for casej in cases)
-    )
+    return remove_specified_cases(testcases, cases)
+
+
+def remove_specified_cases(testcases: Set[str], case_names: Iterable[str]) -> Set[str]:
+    """
+    Remove the testcases ending with any of the case names, the same as
+    checking `testcase.endswith(case_name)` for each pair, but only looking up
+    the suffixes of each testcase with the lengths of the case names.
+    """
+    names_by_length: Dict[int, Set[str]] = {}
+    for case_name in case_names:
+        names_by_length.setdefault(len(case_name), set()).add(case_name)
+    if 0 in names_by_length:  # every string ends with ""
+        return set()
+    return {
+        testcase
+        for testcase in testcases
+        if not any(
+            testcase[-length:] in names
+            for length, names in names_by_length.items()
+            if length <= len(testcase)
+        )
+    }
 
 
 def get_stdin_stdout(
@@ -334,35 +411,30 @@ def get_stdin_stdout(
     case_base_dir: Path,
     case_name: str,
     case: task.Case,
+    case_index: Optional[CaseIndex] = None,
 ) -> Tuple[result.Stdin, Optional[str]]:
     base_dir = (task_root / task_path).parent / case_base_dir
+    if case_index is None:
+        case_index = CaseIndex(base_dir)
     stdin: result.Stdin = result.MemoryFile(content="")
-    stdout = None
-    for case_stdout_path in base_dir.glob("**/*.out"):
-        if not case.out_:  # if not set, look for .out files with case name
-            if case_stdout_path.name != f"{case_name}.out":
-                continue
-        else:  # if set, look for .out files with the same relative path
-            if PurePosixPath(case.out_) != PurePosixPath(case_stdout_path).relative_to(
-                base_dir
-            ):
-                continue
-        stdout = str(JOJ3_CONFIG_ROOT / case_stdout_path.relative_to(task_root))
-        case_stdin_path = case_stdout_path.with_suffix(".in")
-        if case.in_:
-            case_stdin_path = Path(base_dir / case.in_)
-        if not case_stdin_path.exists():
-            logger.warning(
-                f"In file {task_root / task_path}, "
-                f"testcase {case_stdout_path} has no .in file, "
-                "use empty content as stdin"
-            )
-        else:
-            stdin = result.LocalFile(
-                src=str(
-                    JOJ3_CONFIG_ROOT
-                    / PurePosixPath(case_stdin_path.relative_to(task_root))
-                )
+    case_stdout_path = case_index.find_out(case_name, case)
+    if case_stdout_path is None:
+        return stdin, None
+    stdout = str(JOJ3_CONFIG_ROOT / case_stdout_path.relative_to(task_root))
+    deps.record_file(case_stdout_path)
+    case_stdin_path = case_stdout_path.with_suffix(".in")
+    if case.in_:
+        case_stdin_path = Path(base_dir / case.in_)
+    if not deps.exists(case_stdin_path):
+        logger.warning(
+            f"In file {task_root / task_path}, "
+            f"testcase {case_stdout_path} has no .in file, "
+            "use empty content as stdin"
+        )
+    else:
+        stdin = result.LocalFile(
+            src=str(
+                JOJ3_CONFIG_ROOT / PurePosixPath(case_stdin_path.relative_to(task_root))
             )
-        break
+        )
     return stdin, stdout
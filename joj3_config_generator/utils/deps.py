@@ -0,0 +1,129 @@
+import hashlib
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from joj3_config_generator.utils import index
+from joj3_config_generator.utils.fs import get_fs
+
+FileStat = Tuple[int, int]  # (size, mtime_ns)
+
+
+@dataclass
+class Dependencies:
+    """
+    Inputs read while converting a single task. Files are recorded with their
+    stat at read time (None if they do not exist), globs with their matches.
+    """
+
+    files: Dict[Path, Optional[FileStat]] = field(default_factory=dict)
+    digests: Dict[Path, str] = field(default_factory=dict)
+    globs: Dict[Tuple[Path, str], List[Path]] = field(default_factory=dict)
+
+
+_current: ContextVar[Optional[Dependencies]] = ContextVar(
+    "joj3_dependencies", default=None
+)
+
+
+@contextmanager
+def track_dependencies() -> Iterator[Dependencies]:
+    deps = Dependencies()
+    token = _current.set(deps)
+    try:
+        yield deps
+    finally:
+        _current.reset(token)
+
+
+def merge_dependencies(other: Dependencies) -> None:
+    deps = _current.get()
+    if deps is None:
+        return
+    deps.files.update(other.files)
+    deps.digests.update(other.digests)
+    deps.globs.update(other.globs)
+
+
+def stat_file(path: Path) -> Optional[FileStat]:
+    st = get_fs().stat(path)
+    if st is None:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def record_file(path: Path, sha256: Optional[str] = None) -> None:
+    deps = _current.get()
+    if deps is None:
+        return
+    deps.files[path] = stat_file(path)
+    if sha256 is not None:
+        deps.digests[path] = sha256
+
+
+def exists(path: Path) -> bool:
+    record_file(path)
+    return index.exists(path)
+
+
+def glob(base_dir: Path, pattern: str) -> List[Path]:
+    matches = index.glob(base_dir, pattern)
+    deps = _current.get()
+    if deps is not None:
+        deps.globs[(base_dir, pattern)] = matches
+    return matches
+
+
+def hash_listing(root: Path, paths: Iterable[Path]) -> str:
+    listing = "\n".join(
+        sorted(Path(os.path.relpath(p, root)).as_posix() for p in paths)
+    )
+    return hashlib.sha256(listing.encode()).hexdigest()
+
+
+def format_listing_stamp(deps: Dependencies) -> str:
+    """
+    The hash of the matches of each glob, which only changes when a match is
+    added or removed.
+    """
+    lines = [
+        f"{base_dir}|{pattern} {hash_listing(base_dir, matches)}\n"
+        for (base_dir, pattern), matches in deps.globs.items()
+    ]
+    return "".join(sorted(lines))
+
+
+def escape_make_path(path: Path) -> str:
+    return str(path).replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
+
+
+def get_depfile_inputs(deps: Dependencies) -> List[Path]:
+    """
+    Existing files read. The directories searched by globs are left out, as
+    the outputs are written in them or in their parents, which would make
+    them always newer than the outputs, the listing stamp is used instead.
+    """
+    return sorted(path for path, stat in deps.files.items() if stat is not None)
+
+
+def format_depfile(
+    target: Path, deps: Dependencies, listing_stamp_path: Optional[Path] = None
+) -> str:
+    """
+    Make style depfile of target, with an empty rule for every input so that
+    make does not fail when one of them is removed, as gcc -MP does. The
+    listing stamp, see format_listing_stamp, stands for the directories.
+    """
+    input_paths = get_depfile_inputs(deps)
+    if listing_stamp_path is not None:
+        input_paths.append(listing_stamp_path)
+    inputs = [escape_make_path(path) for path in sorted(input_paths)]
+    lines = [f"{escape_make_path(target)}:"]
+    lines += [f"  {path}" for path in inputs]
+    content = " \\\n".join(lines) + "\n"
+    for path in inputs:
+        content += f"\n{path}:\n"
+    return content
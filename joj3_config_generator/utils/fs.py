@@ -0,0 +1,355 @@
+import io
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from pathlib import Path
+from stat import S_ISDIR
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from joj3_config_generator.utils import tracing
+
+
+class StatResult(NamedTuple):
+    st_size: int
+    st_mtime_ns: int
+    st_ino: int
+    st_ctime_ns: int
+    is_dir: bool
+
+
+class DirEntry(NamedTuple):
+    # whether the entry is a directory, following symlinks
+    is_dir: bool
+    is_symlink: bool = False
+
+
+# entry name -> DirEntry, in listing order
+Listing = Dict[str, DirEntry]
+
+
+class FileSystem(ABC):
+    """
+    The files read while converting: toml files, ignore files, directory
+    listings for the case and immutable files, and the immutable files to
+    hash. Every call is counted in the tracer, the backing store is left to
+    the subclasses.
+    """
+
+    def stat(self, path: Path) -> Optional[StatResult]:
+        """
+        Stat path following symlinks, None if it does not exist.
+        """
+        tracing.count("fs_stat")
+        return self._stat(path)
+
+    def listdir(self, dir_path: Path) -> Optional[Listing]:
+        """
+        Return the entries of dir_path, None if it is not a readable
+        directory.
+        """
+        tracing.count("fs_listdir")
+        return self._listdir(dir_path)
+
+    def read_bytes(self, path: Path) -> bytes:
+        tracing.count("fs_read")
+        return self._read_bytes(path)
+
+    def read_text(self, path: Path) -> str:
+        return self.read_bytes(path).decode()
+
+    def open(self, path: Path) -> BinaryIO:
+        tracing.count("fs_read")
+        return self._open(path)
+
+    def write_bytes(self, path: Path, content: bytes) -> None:
+        self._write_bytes(path, content)
+
+    def write_text(self, path: Path, content: str) -> None:
+        self.write_bytes(path, content.encode())
+
+    def exists(self, path: Path) -> bool:
+        return self.stat(path) is not None
+
+    def is_dir(self, path: Path) -> bool:
+        st = self.stat(path)
+        return st is not None and st.is_dir
+
+    def get_sha256(self, path: Path) -> Optional[str]:
+        """
+        The digest of path if it is known without reading it, else None.
+        """
+        return None
+
+    def walk_dirs(self, base_dir: Path) -> Iterator[Path]:
+        for dir_path, _ in self.walk_listings(base_dir):
+            yield dir_path
+
+    def walk_listings(self, base_dir: Path) -> Iterator[Tuple[Path, Listing]]:
+        # pre-order, each directory before its sub directories, which come in
+        # listing order. Symlinks to directories are not followed, as in
+        # pathlib's "**"
+        listing = self.listdir(base_dir)
+        if listing is None:
+            return
+        yield base_dir, listing
+        for name, entry in listing.items():
+            if entry.is_dir and not entry.is_symlink:
+                yield from self.walk_listings(base_dir / name)
+
+    def glob(self, base_dir: Path, pattern: str) -> List[Path]:
+        """
+        Match pattern against the paths under base_dir, with "**" for any
+        number of directories and fnmatch patterns for single names. Matches
+        are in walk order, which is not pathlib's on every version, so sort
+        them where the order matters.
+        """
+        paths = [base_dir]
+        # the listings read by "**", used again to match the next part
+        listings: Dict[Path, Listing] = {}
+        parts = pattern.split("/")
+        for i, part in enumerate(parts):
+            if part == "**":
+                walked = [
+                    walked_dir
+                    for path in paths
+                    for walked_dir in self.walk_listings(path)
+                ]
+                paths = [dir_path for dir_path, _ in walked]
+                listings = dict(walked)
+                continue
+            is_last = i == len(parts) - 1
+            paths = [
+                path / name
+                for path in paths
+                for name, entry in self.get_listing(path, listings).items()
+                if (is_last or entry.is_dir) and fnmatchcase(name, part)
+            ]
+            listings = {}
+        return paths
+
+    def get_listing(self, dir_path: Path, listings: Dict[Path, Listing]) -> Listing:
+        listing = listings.get(dir_path)
+        if listing is None:
+            listing = self.listdir(dir_path) or {}
+        return listing
+
+    @abstractmethod
+    def _stat(self, path: Path) -> Optional[StatResult]: ...
+
+    @abstractmethod
+    def _listdir(self, dir_path: Path) -> Optional[Listing]: ...
+
+    @abstractmethod
+    def _read_bytes(self, path: Path) -> bytes: ...
+
+    def _open(self, path: Path) -> BinaryIO:
+        return io.BytesIO(self._read_bytes(path))
+
+    @abstractmethod
+    def _write_bytes(self, path: Path, content: bytes) -> None: ...
+
+
+class OSFileSystem(FileSystem):
+    """
+    The real disk. With cache, stats and listings are kept for the lifetime
+    of the instance, so create one per run.
+    """
+
+    def __init__(self, cache: bool = True) -> None:
+        self.cache = cache
+        self.stats: Dict[Path, Optional[StatResult]] = {}
+        self.listings: Dict[Path, Optional[Listing]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # worker processes fill their own caches
+        return {**self.__dict__, "stats": {}, "listings": {}}
+
+    def _stat(self, path: Path) -> Optional[StatResult]:
+        if self.cache and path in self.stats:
+            tracing.count("fs_stat_cache_hit")
+            return self.stats[path]
+        try:
+            st = os.stat(path)
+            result: Optional[StatResult] = StatResult(
+                st.st_size,
+                st.st_mtime_ns,
+                st.st_ino,
+                st.st_ctime_ns,
+                S_ISDIR(st.st_mode),
+            )
+        except (OSError, ValueError):
+            result = None
+        if self.cache:
+            tracing.count("fs_stat_cache_miss")
+            self.stats[path] = result
+        return result
+
+    def _listdir(self, dir_path: Path) -> Optional[Listing]:
+        if self.cache and dir_path in self.listings:
+            tracing.count("fs_listdir_cache_hit")
+            return self.listings[dir_path]
+        entries: Listing = {}
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                        is_symlink = entry.is_symlink()
+                    except OSError:
+                        is_dir = is_symlink = False
+                    entries[entry.name] = DirEntry(is_dir, is_symlink)
+        except OSError:
+            listing = None
+        else:
+            listing = entries
+        if self.cache:
+            tracing.count("fs_listdir_cache_miss")
+            self.listings[dir_path] = listing
+        return listing
+
+    def _read_bytes(self, path: Path) -> bytes:
+        return path.read_bytes()
+
+    def _open(self, path: Path) -> BinaryIO:
+        return open(path, "rb")
+
+    def _write_bytes(self, path: Path, content: bytes) -> None:
+        path.write_bytes(content)
+        self.stats.pop(path, None)
+        self.listings.pop(path.parent, None)
+
+
+class MemoryFileSystem(FileSystem):
+    """
+    A tree of files held in memory, for tests and for trees that are not on
+    the disk. Parent directories are created with the files.
+    """
+
+    def __init__(self, files: Optional[Dict[Path, bytes]] = None) -> None:
+        self.files: Dict[Path, bytes] = {}
+        self.dirs: Dict[Path, Listing] = {}
+        self.stats: Dict[Path, StatResult] = {}
+        for path, content in (files or {}).items():
+            self.write_bytes(path, content)
+
+    def make_dir(self, dir_path: Path) -> None:
+        if dir_path in self.dirs:
+            return
+        self.dirs[dir_path] = {}
+        self.stats[dir_path] = self.make_stat(0, is_dir=True)
+        if dir_path.parent != dir_path:
+            self.make_dir(dir_path.parent)
+            self.dirs[dir_path.parent][dir_path.name] = DirEntry(is_dir=True)
+
+    def make_stat(self, size: int, is_dir: bool = False) -> StatResult:
+        now = time.time_ns()
+        return StatResult(size, now, len(self.stats) + 1, now, is_dir)
+
+    def _stat(self, path: Path) -> Optional[StatResult]:
+        return self.stats.get(path)
+
+    def _listdir(self, dir_path: Path) -> Optional[Listing]:
+        entries = self.dirs.get(dir_path)
+        return dict(entries) if entries is not None else None
+
+    def _read_bytes(self, path: Path) -> bytes:
+        if path not in self.files:
+            raise FileNotFoundError(f"No such file: '{path}'")
+        return self.files[path]
+
+    def _write_bytes(self, path: Path, content: bytes) -> None:
+        self.make_dir(path.parent)
+        self.files[path] = content
+        self.dirs[path.parent][path.name] = DirEntry(is_dir=False)
+        self.stats[path] = self.make_stat(len(content))
+
+
+class OverlayFileSystem(FileSystem):
+    """
+    A file system read from base, with the files written kept in memory on
+    top of it instead of written to base. Files can only be written in the
+    directories of base.
+    """
+
+    def __init__(self, base: FileSystem) -> None:
+        self.base = base
+        self.written = MemoryFileSystem()
+
+    def get_sha256(self, path: Path) -> Optional[str]:
+        if path in self.written.files:
+            return None
+        return self.base.get_sha256(path)
+
+    def _stat(self, path: Path) -> Optional[StatResult]:
+        if path in self.written.files:
+            return self.written._stat(path)
+        return self.base._stat(path)
+
+    def _listdir(self, dir_path: Path) -> Optional[Listing]:
+        listing = self.base._listdir(dir_path)
+        if listing is None:
+            return None
+        for name in self.written._listdir(dir_path) or {}:
+            if dir_path / name in self.written.files:
+                listing = {**listing, name: DirEntry(is_dir=False)}
+        return listing
+
+    def _read_bytes(self, path: Path) -> bytes:
+        if path in self.written.files:
+            return self.written._read_bytes(path)
+        return self.base._read_bytes(path)
+
+    def _open(self, path: Path) -> BinaryIO:
+        if path in self.written.files:
+            return self.written._open(path)
+        return self.base._open(path)
+
+    def _write_bytes(self, path: Path, content: bytes) -> None:
+        self.written._write_bytes(path, content)
+
+
+# stats and listings read outside of a run are not cached
+_os_fs = OSFileSystem(cache=False)
+
+_current: ContextVar[Optional[FileSystem]] = ContextVar(
+    "joj3_file_system", default=None
+)
+
+
+@contextmanager
+def use_fs(fs: Optional[FileSystem]) -> Iterator[None]:
+    token = _current.set(fs)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def use_cached_fs() -> Iterator[None]:
+    """
+    Cache the stats and listings of the disk in the block, unless a file
+    system is already in use, e.g. the one of a directory index.
+    """
+    if _current.get() is not None:
+        yield
+        return
+    with use_fs(OSFileSystem()):
+        yield
+
+
+def get_fs() -> FileSystem:
+    fs = _current.get()
+    return fs if fs is not None else _os_fs
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from joj3_config_generator.utils.fs import StatResult
+from joj3_config_generator.utils.logger import logger
+
+# files modified this recently are not cached, as a later modification may
+# keep the same size and mtime within the timestamp granularity
+RACY_WINDOW_NS = 2_000_000_000
+
+StatKey = Tuple[int, int, int, int]  # (size, mtime_ns, inode, ctime_ns)
+
+
+def default_hash_cache_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "joj3-config-generator" / "sha256.sqlite3"
+
+
+def get_stat_key(st: Union[os.stat_result, StatResult]) -> StatKey:
+    return st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns
+
+
+class HashCache:
+    """
+    SHA-256 digests of files stored in a sqlite database, keyed by the
+    absolute path and its stat. Lookups and writes never fail the conversion,
+    errors only disable the cache. Safe to share between processes and
+    threads, each of which opens its own connection.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.pending: List[Tuple[str, int, int, int, int, str]] = []
+        # the connection and the pid that opened it, for the current thread
+        self._local = threading.local()
+        self._disabled = False
+
+    def connect(self) -> Optional[sqlite3.Connection]:
+        if self._disabled:
+            return None
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sha256 ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                "inode INTEGER, ctime_ns INTEGER, digest TEXT)"
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Hash cache {self.path} disabled: {e}")
+            self._disabled = True
+            return None
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(
+        self, file_path: Path, st: Union[os.stat_result, StatResult]
+    ) -> Optional[str]:
+        conn = self.connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT size, mtime_ns, inode, ctime_ns, digest FROM sha256 "
+                "WHERE path = ?",
+                (str(file_path.absolute()),),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or tuple(row[:4]) != get_stat_key(st):
+            return None
+        return str(row[4])
+
+    def put(
+        self, file_path: Path, st: Union[os.stat_result, StatResult], digest: str
+    ) -> None:
+        if time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS:
+            return
+        self.pending.append((str(file_path.absolute()), *get_stat_key(st), digest))
+
+    def flush(self) -> None:
+        conn = self.connect()
+        if conn is None or not self.pending:
+            self.pending.clear()
+            return
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO sha256 VALUES (?, ?, ?, ?, ?, ?)",
+                    self.pending,
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"Failed to write hash cache {self.path}: {e}")
+        self.pending.clear()
+
+
+_hash_cache: Optional[HashCache] = None
+
+
+def set_hash_cache(path: Optional[Path]) -> None:
+    global _hash_cache
+    _hash_cache = HashCache(path) if path is not None else None
+
+
+def get_hash_cache() -> Optional[HashCache]:
+    return _hash_cache
@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from joj3_config_generator.utils import tracing
+from joj3_config_generator.utils.fs import FileSystem, OSFileSystem, get_fs, use_fs
+
+IGNORE_FILENAME = ".joj3ignore"
+
+
+class IgnoreRule(NamedTuple):
+    base_dir: Path
+    pattern: str
+    dir_only: bool
+
+    def match(self, path: Path, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if "/" in self.pattern:
+            rel_path = PurePosixPath(path.relative_to(self.base_dir)).as_posix()
+            return fnmatchcase(rel_path, self.pattern.lstrip("/"))
+        return fnmatchcase(path.name, self.pattern)
+
+
+def read_ignore_rules(dir_path: Path, fs: FileSystem) -> List[IgnoreRule]:
+    ignore_path = dir_path / IGNORE_FILENAME
+    try:
+        lines = fs.read_text(ignore_path).splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+    rules = []
+    for line in lines:
+        pattern = line.strip()
+        if not pattern or pattern.startswith("#"):
+            continue
+        rules.append(
+            IgnoreRule(dir_path, pattern.rstrip("/"), dir_only=pattern.endswith("/"))
+        )
+    return rules
+
+
+class DirectoryIndex:
+    """
+    Listing of every directory under root, built by a single walk of fs, the
+    disk by default. Entries matching a pattern in a .joj3ignore file are
+    left out, together with everything below them. Queries outside the index
+    go to fs, which is also used for the reads during a conversion with this
+    index.
+    """
+
+    def __init__(self, root: Path, fs: Optional[FileSystem] = None) -> None:
+        self.root = root
+        self.fs = fs if fs is not None else OSFileSystem()
+        # directory -> {entry name: is_dir}, in os.scandir order
+        self.entries: Dict[Path, Dict[str, bool]] = {}
+        with tracing.span("directory walk", root=str(root)) as args:
+            self._walk(root, [])
+            args["dirs"] = len(self.entries)
+
+    def _walk(self, dir_path: Path, rules: List[IgnoreRule]) -> None:
+        listing = self.fs.listdir(dir_path)
+        if listing is None:
+            return
+        rules = rules + read_ignore_rules(dir_path, self.fs)
+        listing = {
+            name: entry
+            for name, entry in listing.items()
+            if not any(rule.match(dir_path / name, entry.is_dir) for rule in rules)
+        }
+        self.entries[dir_path] = {name: entry.is_dir for name, entry in listing.items()}
+        # symlinks to directories are not followed, as in pathlib's "**", so
+        # queries below them go to fs
+        for name, entry in listing.items():
+            if entry.is_dir and not entry.is_symlink:
+                self._walk(dir_path / name, rules)
+
+    def walk_dirs(self, base_dir: Path) -> Iterator[Path]:
+        # the same order as FileSystem.walk_dirs
+        yield base_dir
+        for name, is_dir in self.entries.get(base_dir, {}).items():
+            if is_dir and base_dir / name in self.entries:
+                yield from self.walk_dirs(base_dir / name)
+
+    def glob(self, base_dir: Path, pattern: str) -> List[Path]:
+        parts = pattern.split("/")
+        if base_dir not in self.entries or len(parts) > 2:
+            return self.fs.glob(base_dir, pattern)
+        if len(parts) == 2:
+            if parts[0] != "**":
+                return self.fs.glob(base_dir, pattern)
+            dirs: Iterator[Path] = self.walk_dirs(base_dir)
+        else:
+            dirs = iter([base_dir])
+        return [
+            dir_path / name
+            for dir_path in dirs
+            for name in self.entries[dir_path]
+            if fnmatchcase(name, parts[-1])
+        ]
+
+    def lookup(self, path: Path) -> Optional[bool]:
+        """
+        Return whether path is a directory, None if it does not exist.
+        """
+        if path.parent not in self.entries:
+            st = self.fs.stat(path)
+            return st.is_dir if st is not None else None
+        return self.entries[path.parent].get(path.name)
+
+    def exists(self, path: Path) -> bool:
+        return self.lookup(path) is not None
+
+    def is_dir(self, path: Path) -> bool:
+        return self.lookup(path) is True
+
+    def add_file(self, path: Path) -> None:
+        if path.parent in self.entries:
+            self.entries[path.parent][path.name] = False
+
+
+_current: ContextVar[Optional[DirectoryIndex]] = ContextVar(
+    "joj3_directory_index", default=None
+)
+
+
+@contextmanager
+def use_index(index: Optional[DirectoryIndex]) -> Iterator[None]:
+    token = _current.set(index)
+    try:
+        with use_fs(index.fs if index is not None else get_fs()):
+            yield
+    finally:
+        _current.reset(token)
+
+
+def glob(base_dir: Path, pattern: str) -> List[Path]:
+    index = _current.get()
+    if index is None:
+        return get_fs().glob(base_dir, pattern)
+    return index.glob(base_dir, pattern)
+
+
+def exists(path: Path) -> bool:
+    index = _current.get()
+    if index is None:
+        return get_fs().exists(path)
+    return index.exists(path)
+
+
+def is_dir(path: Path) -> bool:
+    index = _current.get()
+    if index is None:
+        return get_fs().is_dir(path)
+    return index.is_dir(path)
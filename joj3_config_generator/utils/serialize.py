@@ -0,0 +1,95 @@
+import json
+import re
+from typing import Any, Dict, Optional, Protocol
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover
+    HAS_ORJSON = False
+
+
+class JsonDumps(Protocol):
+    def __call__(self, obj: Any, compact: bool = False) -> str: ...
+
+
+# a line holding a float value in the indented output, with its key if any
+_FLOAT_LINE = re.compile(
+    r'^( *(?:"(?:[^"\\\n]|\\.)*": )?)(?=-?\d+[.e])(-?\d+(?:\.\d+)?(?:e-?\d+)?)(,?)$',
+    re.MULTILINE,
+)
+# cheap check for any float in the output before running _FLOAT_LINE
+_FLOAT_HINT = re.compile(r"[.e]\d+,?\n")
+# anything that may be a float in the compact output
+_COMPACT_FLOAT_HINT = re.compile(r"[:,\[]-?\d+[.e]")
+
+
+def dumps_stdlib(obj: Any, compact: bool = False) -> str:
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+    return json.dumps(obj, ensure_ascii=False, indent=4) + "\n"
+
+
+def _fix_float(match: "re.Match[str]") -> str:
+    # python and orjson both print the shortest repr, but differ in when and
+    # how to use the exponent notation
+    return f"{match[1]}{float(match[2])!r}{match[3]}"
+
+
+def dumps_orjson(obj: Any, compact: bool = False) -> str:
+    """
+    Same output as dumps_stdlib. orjson only indents by 2 spaces, so the
+    indentation is doubled afterwards. Falls back to dumps_stdlib for values
+    orjson refuses, e.g. integers over 64 bits or non-str keys. NaN and
+    infinity, which are not valid json anyway, become null. Compact output
+    that may hold floats is left to dumps_stdlib.
+    """
+    option = orjson.OPT_APPEND_NEWLINE
+    if not compact:
+        option |= orjson.OPT_INDENT_2
+    try:
+        content = orjson.dumps(obj, option=option).decode()
+    except TypeError:  # orjson.JSONEncodeError
+        return dumps_stdlib(obj, compact)
+    if compact:
+        if _COMPACT_FLOAT_HINT.search(content):
+            return dumps_stdlib(obj, compact)
+        return content
+    content = "\n".join(
+        line[: len(line) - len(line.lstrip(" "))] + line for line in content.split("\n")
+    )
+    if _FLOAT_HINT.search(content):
+        content = _FLOAT_LINE.sub(_fix_float, content)
+    return content
+
+
+JSON_BACKENDS: Dict[str, JsonDumps] = {"json": dumps_stdlib}
+if HAS_ORJSON:
+    JSON_BACKENDS["orjson"] = dumps_orjson
+
+_dumps: JsonDumps = dumps_orjson if HAS_ORJSON else dumps_stdlib
+
+
+def set_json_backend(name: Optional[str]) -> None:
+    """
+    Select a backend from JSON_BACKENDS, the fastest available one if None.
+    """
+    global _dumps
+    if name is None:
+        _dumps = dumps_orjson if HAS_ORJSON else dumps_stdlib
+        return
+    if name not in JSON_BACKENDS:
+        raise ValueError(
+            f"Unknown json backend {name}, available: {', '.join(JSON_BACKENDS)}"
+        )
+    _dumps = JSON_BACKENDS[name]
+
+
+def dumps_json(obj: Any, compact: bool = False) -> str:
+    """
+    Serialize obj with 4 spaces indent, or no whitespace at all if compact,
+    non-ASCII characters kept as is and a trailing newline, whichever backend
+    is selected.
+    """
+    return _dumps(obj, compact)
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# summary rows shown for the slowest tasks and the largest stages
+SUMMARY_TOP_N = 10
+
+
+class Tracer:
+    """
+    Spans and counters of a convert run, in the Chrome trace event format.
+    Workers trace into their own tracer, which is drained after each task and
+    merged into the tracer of the parent process.
+    """
+
+    def __init__(self) -> None:
+        self.events: List[Dict[str, Any]] = []
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.peak_memory = 0
+        self.worker_peak_memory = 0
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter_ns()
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": start / 1000,
+                    "dur": (end - start) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_native_id(),
+                    "args": args,
+                }
+            )
+
+    def drain(self) -> "Tracer":
+        drained = Tracer()
+        drained.events, self.events = self.events, []
+        drained.counters, self.counters = self.counters, defaultdict(int)
+        if tracemalloc.is_tracing():
+            drained.peak_memory = tracemalloc.get_traced_memory()[1]
+        return drained
+
+    def merge(self, other: "Tracer") -> None:
+        self.events.extend(other.events)
+        for key, value in other.counters.items():
+            self.counters[key] += value
+        self.worker_peak_memory = max(self.worker_peak_memory, other.peak_memory)
+
+    def dump(self, trace_path: Path) -> None:
+        trace_path.write_text(
+            json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}) + "\n"
+        )
+
+    def durations(self, cat: str) -> List[Tuple[float, Dict[str, Any]]]:
+        return [
+            (event["dur"] / 1e6, event["args"])
+            for event in self.events
+            if event["cat"] == cat
+        ]
+
+    def summary(self) -> str:
+        phases: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        for event in self.events:
+            if event["cat"] != "phase":
+                continue
+            phases[event["name"]][0] += event["dur"] / 1e6
+            phases[event["name"]][1] += 1
+        lines = ["Phases (spans may nest, e.g. hash within transform):"]
+        for name, (total, count) in sorted(phases.items(), key=lambda x: -x[1][0]):
+            lines.append(f"  {total:9.3f}s  {count:6}x  {name}")
+        tasks = sorted(self.durations("task"), key=lambda x: -x[0])
+        lines.append(f"Slowest tasks ({len(tasks)} converted):")
+        for duration, args in tasks[:SUMMARY_TOP_N]:
+            lines.append(f"  {duration:9.3f}s  {args['path']}")
+        stages = sorted(
+            (args for _, args in self.durations("stage") if args.get("cases")),
+            key=lambda args: -args["cases"],
+        )
+        lines.append("Cases per stage (largest first):")
+        for args in stages[:SUMMARY_TOP_N]:
+            lines.append(f"  {args['cases']:9}  {args['task']} {args['stage']}")
+        counters = self.counters
+        lines.append(
+            f"Hashed {counters['hash_files']} file(s), "
+            f"{counters['hash_bytes'] / 1024 / 1024:.2f} MiB"
+        )
+        lines.append(
+            f"File system: {counters['fs_stat']} stat, "
+            f"{counters['fs_listdir']} listdir, {counters['fs_read']} read"
+        )
+        for name in [
+            "hash_cache",
+            "health_check_cache",
+            "manifest",
+            "fs_stat_cache",
+            "fs_listdir_cache",
+        ]:
+            hit, miss = counters[f"{name}_hit"], counters[f"{name}_miss"]
+            if hit + miss:
+                lines.append(
+                    f"{name} hit rate: {hit / (hit + miss):.1%} ({hit}/{hit + miss})"
+                )
+        lines.append(
+            f"Peak memory (tracemalloc): {self.peak_memory / 1024 / 1024:.2f} MiB"
+            + (
+                f", {self.worker_peak_memory / 1024 / 1024:.2f} MiB in workers"
+                if self.worker_peak_memory
+                else ""
+            )
+        )
+        return "\n".join(lines)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+@contextmanager
+def span(name: str, cat: str = "phase", **args: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Trace the enclosed block if a tracer is set. The yielded dict holds the
+    args of the span, and can be filled in with results inside the block.
+    """
+    if _tracer is None:
+        yield args
+        return
+    with _tracer.span(name, cat, **args) as span_args:
+        yield span_args
+
+
+def start_tracing() -> None:
+    tracemalloc.start()
+    set_tracer(Tracer())
+
+
+def stop_tracing(trace_path: Path) -> str:
+    """
+    Write the trace to trace_path, and return the summary of it.
+    """
+    tracer = get_tracer()
+    assert tracer is not None
+    tracer.peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    set_tracer(None)
+    tracer.dump(trace_path)
+    return tracer.summary()
+
+
+def count(name: str, value: int = 1) -> None:
+    if _tracer is not None:
+        _tracer.counters[name] += value
@@ -0,0 +1,169 @@
+import time
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from joj3_config_generator.batch import (
+    RepoConfs,
+    TaskJob,
+    find_tasks,
+    get_depfile_path,
+    get_listing_stamp_path,
+    run_tasks,
+    write_depfile,
+    write_failure_jsons,
+    write_result_json,
+)
+from joj3_config_generator.utils.deps import Dependencies, FileStat
+from joj3_config_generator.utils.index import IGNORE_FILENAME, DirectoryIndex
+from joj3_config_generator.utils.logger import logger
+
+
+def snapshot_files(index: DirectoryIndex) -> Dict[Path, FileStat]:
+    files = {}
+    for dir_path, entries in index.entries.items():
+        for name, is_dir in entries.items():
+            if is_dir:
+                continue
+            file_path = dir_path / name
+            # stats are cached by the index, and reused by the conversion
+            st = index.fs.stat(file_path)
+            if st is None:
+                continue
+            files[file_path] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+class Watcher:
+    """
+    Keep the tasks, their dependencies and the parsed repo configs of a root
+    in memory, and reconvert only the tasks affected by changed files.
+    """
+
+    def __init__(
+        self, root: Path, jobs: int, compact: bool = False, depfile: bool = False
+    ) -> None:
+        self.root = root
+        self.jobs = jobs
+        self.compact = compact
+        self.depfile = depfile
+        self.index = DirectoryIndex(root)
+        self.files = snapshot_files(self.index)
+        self.tasks: List[TaskJob] = []
+        self.deps: Dict[TaskJob, Optional[Dependencies]] = {}
+        self.repo_confs: RepoConfs = {}
+
+    def convert(self, tasks: List[TaskJob]) -> int:
+        """
+        Convert tasks and return the number of files written.
+        """
+        error_json_paths = []
+        written_count = 0
+        for res in run_tasks(
+            self.root, tasks, self.jobs, self.index, self.repo_confs, self.compact
+        ):
+            self.deps[res.job] = res.deps
+            if self.depfile:
+                write_depfile(res)
+            if res.content is None:
+                error_json_paths.append(res.job.result_json_path)
+                continue
+            written_count += write_result_json(res.job.result_json_path, res.content)
+        if error_json_paths:
+            written_count += write_failure_jsons(error_json_paths, self.compact)
+            logger.error(
+                f"Failed to convert {len(error_json_paths)} file(s): {', '.join(str(json_path) for json_path in error_json_paths)}. Check previous errors for details."
+            )
+        return written_count
+
+    def is_affected(self, job: TaskJob, changed: Set[Path]) -> bool:
+        if job.repo_toml_path in changed or job.task_toml_path in changed:
+            return True
+        deps = self.deps.get(job)
+        if deps is None:
+            return False
+        if any(path in deps.files for path in changed):
+            return True
+        # files added to or removed from a globbed directory
+        return any(
+            path.is_relative_to(base_dir)
+            and fnmatchcase(path.name, pattern.rsplit("/", 1)[-1])
+            for base_dir, pattern in deps.globs
+            for path in changed
+        )
+
+    def invalidate_repos(self, changed: Set[Path]) -> None:
+        for repo_toml_path, repo_conf in list(self.repo_confs.items()):
+            if repo_toml_path in changed or repo_conf is None:
+                del self.repo_confs[repo_toml_path]
+                continue
+            immutable_dir = (
+                repo_conf.root / repo_conf.path
+            ).parent / repo_conf.health_check.immutable_path
+            if any(path.is_relative_to(immutable_dir) for path in changed):
+                del self.repo_confs[repo_toml_path]
+
+    def poll(self) -> Set[Path]:
+        self.index = DirectoryIndex(self.root)
+        files = snapshot_files(self.index)
+        changed = {
+            path
+            for path in self.files.keys() | files.keys()
+            if self.files.get(path) != files.get(path)
+        }
+        self.files = files
+        outputs = {job.result_json_path for job in self.tasks}
+        outputs.update(
+            output_path
+            for path in list(outputs)
+            for output_path in [get_depfile_path(path), get_listing_stamp_path(path)]
+        )
+        return {path for path in changed if path not in outputs}
+
+    def refresh(self, changed: Set[Path]) -> List[TaskJob]:
+        """
+        Update the tasks and the parsed repo configs for the changed files,
+        and return the tasks that need to be converted again.
+        """
+        if any(
+            path.suffix == ".toml" or path.name == IGNORE_FILENAME for path in changed
+        ):
+            tasks = find_tasks(self.root, self.index)
+        else:
+            tasks = self.tasks
+        known_tasks = set(self.tasks)
+        self.tasks = tasks
+        self.invalidate_repos(changed)
+        return [
+            job
+            for job in tasks
+            if job not in known_tasks or self.is_affected(job, changed)
+        ]
+
+    def update(self, changed: Set[Path]) -> None:
+        start = time.perf_counter()
+        affected = self.refresh(changed)
+        if not affected:
+            return
+        written_count = self.convert(affected)
+        logger.info(
+            f"Reconverted {len(affected)} task(s) in {time.perf_counter() - start:.3f}s, "
+            f"{written_count} file(s) written"
+        )
+
+    def run(self, interval: float) -> None:
+        start = time.perf_counter()
+        self.tasks = find_tasks(self.root, self.index)
+        self.convert(self.tasks)
+        logger.info(
+            f"Converted {len(self.tasks)} task(s) in {time.perf_counter() - start:.3f}s, "
+            f"watching {self.root.absolute()} for changes"
+        )
+        try:
+            while True:
+                time.sleep(interval)
+                changed = self.poll()
+                if changed:
+                    self.update(changed)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
@@ -0,0 +1,36 @@
+from pathlib import Path
+from typing import List
+
+from joj3_config_generator.affected import select_affected_tasks
+from joj3_config_generator.batch import find_tasks
+from joj3_config_generator.utils.index import IGNORE_FILENAME
+from tests.batch.utils import copy_cases
+
+
+def get_affected(root: Path, *rel_paths: str) -> List[str]:
+    affected = select_affected_tasks(
+        find_tasks(root), [root / rel_path for rel_path in rel_paths]
+    )
+    return sorted(job.task_toml_path.relative_to(root).as_posix() for job in affected)
+
+
+def test_select_affected_tasks(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    assert get_affected(root) == []
+    assert get_affected(root, "diff/task1/case4.in") == ["diff/task.toml"]
+    assert get_affected(root, "diff/task2/new/case.out") == ["diff/task.toml"]
+    assert get_affected(root, "basic/immutable/.gitignore") == ["basic/task.toml"]
+    assert get_affected(root, "diff/repo.toml") == ["diff/task.toml"]
+    assert get_affected(root, "basic/task.toml", "diff/task1/case4.in") == [
+        "basic/task.toml",
+        "diff/task.toml",
+    ]
+    assert get_affected(root, f"diff/{IGNORE_FILENAME}") == ["diff/task.toml"]
+    # outside of the repos
+    assert get_affected(root, "README.md", "other/task1/case4.in") == []
+
+
+def test_select_affected_invalid_toml(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    (root / "diff" / "task.toml").write_text("stages = 1\n")
+    assert get_affected(root, "README.md") == ["diff/task.toml"]
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from joj3_config_generator.api import ConvertError, convert_tree
+from joj3_config_generator.batch import find_tasks, run_tasks
+from joj3_config_generator.utils.hashcache import get_hash_cache
+from tests.batch.utils import CONVERT_CASES_ROOT, copy_cases
+
+
+def test_convert_tree_same_as_convert() -> None:
+    files = sorted(CONVERT_CASES_ROOT.glob("**/*"))
+    results = dict(convert_tree(CONVERT_CASES_ROOT))
+    # nothing is written under the root
+    assert sorted(CONVERT_CASES_ROOT.glob("**/*")) == files
+    assert results
+    for task_toml_path, result in results.items():
+        json_path = task_toml_path.with_suffix(".json")
+        if task_toml_path.parent.name == "extra-field":
+            # the extra-field case fails to load on purpose
+            assert isinstance(result, ConvertError)
+            assert "ValidationError" in str(result)
+            assert result.task_toml_path == task_toml_path
+        else:
+            assert result == json.loads(json_path.read_text())
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_tree_options(tmp_path: Path, jobs: int) -> None:
+    root = copy_cases(tmp_path / "root", "basic", "diff")
+    cache_path = tmp_path / "sha256.sqlite3"
+    results = list(convert_tree(root, jobs=jobs, cache=cache_path, compact=True))
+    assert sorted(task_toml_path for task_toml_path, _ in results) == [
+        root / "basic" / "task.toml",
+        root / "diff" / "task.toml",
+    ]
+    expected = {
+        res.job.task_toml_path: json.loads(res.content or "")
+        for res in run_tasks(root, find_tasks(root), jobs=1, compact=True)
+    }
+    assert dict(results) == expected
+    assert not list(root.glob("**/*.json"))
+    assert get_hash_cache() is None
+
+
+def test_convert_tree_fallback_task(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic")
+    (root / "basic" / "task.toml").unlink()
+    fallback_toml_path = root / "basic" / "conf.toml"
+    results = dict(convert_tree(root))
+    assert list(results) == [fallback_toml_path]
+    assert not fallback_toml_path.exists()
+    (res,) = run_tasks(root, find_tasks(root), jobs=1)
+    assert results[fallback_toml_path] == json.loads(res.content or "")
@@ -0,0 +1,143 @@
+import io
+import os
+import shutil
+import stat
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+import typer
+
+from joj3_config_generator.archive import load_archive
+from joj3_config_generator.main import convert
+from tests.batch.utils import copy_cases
+
+
+def read_jsons(root: Path) -> Dict[str, str]:
+    return {
+        path.relative_to(root).as_posix(): path.read_text()
+        for path in sorted(root.glob("**/*.json"))
+    }
+
+
+@pytest.mark.parametrize("archive_format", ["gztar", "zip"])
+def test_convert_archive(tmp_path: Path, archive_format: str) -> None:
+    src = copy_cases(tmp_path / "src", "basic", "diff", "full")
+    immutable_dir = src / "basic" / "immutable"
+    (immutable_dir / "link").symlink_to(".gitignore")
+    (immutable_dir / "broken").symlink_to("missing")
+    os.link(immutable_dir / ".gitignore", immutable_dir / "hard")
+    archive_path = Path(
+        shutil.make_archive(str(tmp_path / "course"), archive_format, src)
+    )
+    convert(src, jobs=1, hash_cache=False)
+    output = tmp_path / "out"
+    convert(archive_path, jobs=1, hash_cache=False, output=output)
+    # only the json files are written, with the same content
+    assert read_jsons(output) == read_jsons(src)
+    assert {path for path in output.glob("**/*") if path.is_file()} == {
+        output / name for name in read_jsons(src)
+    }
+    convert(archive_path, jobs=2, hash_cache=False, output=output, check=True)
+
+
+def test_archive_members(tmp_path: Path) -> None:
+    archive_path = tmp_path / "course.tar"
+    with tarfile.open(archive_path, "w") as tar_file:
+        for name, content in [
+            ("./repo.toml", b"a = 1\n"),
+            ("./cases/case0.in", b"1 2\n"),
+            ("../evil.toml", b""),
+        ]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar_file.addfile(info, io.BytesIO(content))
+    root = tmp_path / "root"
+    fs = load_archive(archive_path, root)
+    assert fs.read_text(root / "repo.toml") == "a = 1\n"
+    assert fs.glob(root, "**/*.in") == [root / "cases" / "case0.in"]
+    assert fs.get_sha256(root / "cases" / "case0.in") is not None
+    with pytest.raises(OSError):
+        fs.read_bytes(root / "cases" / "case0.in")
+    assert not fs.exists(tmp_path / "evil.toml")
+
+
+def add_tar_member(
+    tar_file: tarfile.TarFile, name: str, content: bytes = b"", **attrs: Any
+) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    for key, value in attrs.items():
+        setattr(info, key, value)
+    tar_file.addfile(info, io.BytesIO(content))
+
+
+def test_archive_links(tmp_path: Path) -> None:
+    archive_path = tmp_path / "course.tar"
+    with tarfile.open(archive_path, "w") as tar_file:
+        add_tar_member(tar_file, "./repo.toml", b"a = 1\n")
+        add_tar_member(tar_file, "./case.in", b"1 2\n")
+        add_tar_member(
+            tar_file, "./hard.in", type=tarfile.LNKTYPE, linkname="./case.in"
+        )
+        add_tar_member(
+            tar_file, "./sub/a.toml", type=tarfile.SYMTYPE, linkname="b.toml"
+        )
+        add_tar_member(
+            tar_file, "./sub/b.toml", type=tarfile.SYMTYPE, linkname="../repo.toml"
+        )
+        add_tar_member(tar_file, "./broken.in", type=tarfile.SYMTYPE, linkname="x.in")
+    root = tmp_path / "root"
+    fs = load_archive(archive_path, root)
+    case_sha256 = fs.get_sha256(root / "case.in")
+    assert case_sha256 is not None
+    assert fs.get_sha256(root / "hard.in") == case_sha256
+    assert fs.read_text(root / "sub" / "a.toml") == "a = 1\n"
+    assert fs.glob(root, "*.in") == [
+        root / "case.in",
+        root / "hard.in",
+        root / "broken.in",
+    ]
+    assert not fs.exists(root / "broken.in")
+
+
+@pytest.mark.parametrize(
+    "name, attrs",
+    [
+        ("./link", {"type": tarfile.SYMTYPE, "linkname": "."}),
+        ("./link", {"type": tarfile.SYMTYPE, "linkname": "../outside"}),
+        ("./link", {"type": tarfile.LNKTYPE, "linkname": "./missing"}),
+    ],
+)
+def test_unsupported_archive_links(
+    tmp_path: Path, name: str, attrs: Dict[str, Any]
+) -> None:
+    archive_path = tmp_path / "course.tar"
+    with tarfile.open(archive_path, "w") as tar_file:
+        add_tar_member(tar_file, "./repo.toml", b"a = 1\n")
+        add_tar_member(tar_file, name, **attrs)
+    with pytest.raises(ValueError):
+        load_archive(archive_path, tmp_path / "root")
+
+
+def test_zip_symlink(tmp_path: Path) -> None:
+    archive_path = tmp_path / "course.zip"
+    with zipfile.ZipFile(archive_path, "w") as zip_file:
+        zip_file.writestr("repo.toml", "a = 1\n")
+        info = zipfile.ZipInfo("conf.toml")
+        info.external_attr = (stat.S_IFLNK | 0o777) << 16
+        zip_file.writestr(info, "repo.toml")
+    root = tmp_path / "root"
+    fs = load_archive(archive_path, root)
+    assert fs.read_text(root / "conf.toml") == "a = 1\n"
+
+
+def test_invalid_archive(tmp_path: Path) -> None:
+    archive_path = tmp_path / "course.tar.gz"
+    archive_path.write_bytes(b"not an archive")
+    with pytest.raises(typer.Exit):
+        convert(archive_path, jobs=1, hash_cache=False)
+    with pytest.raises(typer.Exit):
+        convert(archive_path, jobs=1, hash_cache=False, incremental=True)
@@ -0,0 +1,85 @@
+from pathlib import Path
+from typing import List
+
+from joj3_config_generator.batch import find_tasks, run_tasks, write_result_json
+from joj3_config_generator.utils.index import DirectoryIndex
+from joj3_config_generator.utils.logger import logger
+from tests.batch.utils import copy_cases
+
+
+def test_parallel_same_as_sequential(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff", "full", "extra-field")
+    tasks = find_tasks(root)
+    sequential = list(run_tasks(root, tasks, jobs=1))
+    parallel = list(run_tasks(root, tasks, jobs=4))
+    assert [res.job for res in parallel] == [res.job for res in sequential]
+    assert [res.content for res in parallel] == [res.content for res in sequential]
+    assert [res.content is None for res in sequential].count(True) == 1
+
+
+def test_index_glob_same_as_pathlib(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    # pathlib's "**" does not follow symlinks to directories
+    (root / "basic" / "immutable" / "link").symlink_to(root / "diff")
+    (root / "diff" / "loop").symlink_to(root)
+    index = DirectoryIndex(root)
+    for base_dir in [
+        root,
+        root / "diff",
+        root / "basic" / "immutable",
+        root / "basic" / "immutable" / "link",
+    ]:
+        for pattern in ["**/*.in", "**/*.out", "**/*", "*.toml"]:
+            assert sorted(index.glob(base_dir, pattern)) == sorted(
+                base_dir.glob(pattern)
+            )
+    assert index.is_dir(root / "basic" / "immutable" / "link")
+
+
+def test_broken_immutable_symlink_skipped(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic")
+    (expected,) = run_tasks(root, find_tasks(root), jobs=1)
+    (root / "basic" / "immutable" / "broken").symlink_to(root / "missing")
+    index = DirectoryIndex(root)
+    tasks = find_tasks(root, index)
+    messages: List[str] = []
+    handler_id = logger.add(
+        lambda message: messages.append(message.record["message"]), level="WARNING"
+    )
+    try:
+        (res,) = run_tasks(root, tasks, jobs=1, index=index)
+    finally:
+        logger.remove(handler_id)
+    assert res.content == expected.content
+    assert any(message.startswith("Immutable file not found") for message in messages)
+
+
+def test_nested_repo_and_ignore(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic")
+    copy_cases(root / "basic", "diff")
+    copy_cases(root, "full")
+    (root / ".joj3ignore").write_text("# not a task\nfull/\n")
+    tasks = find_tasks(root)
+    assert [
+        (
+            job.repo_toml_path.relative_to(root).as_posix(),
+            job.task_toml_path.relative_to(root).as_posix(),
+        )
+        for job in sorted(tasks)
+    ] == [
+        ("basic/diff/repo.toml", "basic/diff/task.toml"),
+        ("basic/repo.toml", "basic/task.toml"),
+    ]
+
+
+def test_write_if_changed(tmp_path: Path) -> None:
+    result_json_path = tmp_path / "task.json"
+    assert write_result_json(result_json_path, "{}\n")
+    result_json_path.chmod(0o640)
+    mtime = result_json_path.stat().st_mtime_ns
+    assert not write_result_json(result_json_path, "{}\n")
+    assert result_json_path.stat().st_mtime_ns == mtime
+    assert write_result_json(result_json_path, '{"name": "hw1"}\n')
+    assert result_json_path.read_text() == '{"name": "hw1"}\n'
+    assert result_json_path.stat().st_mode & 0o777 == 0o640
+    assert [p.name for p in tmp_path.iterdir()] == ["task.json"]
@@ -0,0 +1,31 @@
+from pathlib import Path
+from typing import Dict
+
+import pytest
+import typer
+
+from joj3_config_generator.main import convert
+from tests.batch.utils import copy_cases
+
+
+def read_jsons(root: Path) -> Dict[Path, str]:
+    return {path: path.read_text() for path in sorted(root.glob("**/*.json"))}
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_check(tmp_path: Path, incremental: bool) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    convert(root, jobs=1, incremental=incremental, hash_cache=False)
+    jsons = read_jsons(root)
+    convert(root, jobs=1, incremental=incremental, hash_cache=False, check=True)
+    # a new case is picked up by the diff stage
+    (root / "diff" / "task1" / "case99.in").write_text("")
+    (root / "diff" / "task1" / "case99.out").write_text("")
+    with pytest.raises(typer.Exit) as exc_info:
+        convert(root, jobs=1, incremental=incremental, hash_cache=False, check=True)
+    assert exc_info.value.exit_code == 1
+    (root / "basic" / "task.json").unlink()
+    with pytest.raises(typer.Exit):
+        convert(root, jobs=1, incremental=incremental, hash_cache=False, check=True)
+    del jsons[root / "basic" / "task.json"]
+    assert read_jsons(root) == jsons
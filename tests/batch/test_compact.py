@@ -0,0 +1,62 @@
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from joj3_config_generator.batch import find_tasks, run_tasks
+from joj3_config_generator.compact import compact_result_dict, resolve_result_dict
+from joj3_config_generator.utils.serialize import (
+    HAS_ORJSON,
+    dumps_orjson,
+    dumps_stdlib,
+)
+from tests.batch.utils import CONVERT_CASES_ROOT, copy_cases
+
+
+def test_compact_round_trip() -> None:
+    json_paths = sorted(CONVERT_CASES_ROOT.glob("**/*.json"))
+    assert json_paths
+    for json_path in json_paths:
+        full_dict = json.loads(json_path.read_text())
+        compact_dict = copy.deepcopy(full_dict)
+        compact_result_dict(compact_dict)
+        assert resolve_result_dict(compact_dict) == resolve_result_dict(full_dict)
+        assert len(dumps_stdlib(compact_dict)) <= len(dumps_stdlib(full_dict))
+
+
+def test_compact_strips_defaults() -> None:
+    full_dict = json.loads((CONVERT_CASES_ROOT / "diff" / "task.json").read_text())
+    compact_dict = copy.deepcopy(full_dict)
+    compact_result_dict(compact_dict)
+    executor_with = compact_dict["stages"][0]["executor"]["with"]
+    assert "stackLimit" not in executor_with["default"]
+    assert "tty" not in executor_with["default"]
+    assert executor_with["default"]["env"] == ["PATH=/usr/bin:/bin:/usr/local/bin"]
+    diff_output = compact_dict["stages"][0]["parsers"][0]["with"]["cases"][0][
+        "outputs"
+    ][0]
+    assert "maxDiffLength" not in diff_output
+    assert diff_output["score"] == 5
+
+
+def test_convert_compact(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    tasks = find_tasks(root)
+    full = list(run_tasks(root, tasks, jobs=1))
+    compact = list(run_tasks(root, tasks, jobs=2, compact=True))
+    for full_res, compact_res in zip(full, compact):
+        assert full_res.content is not None and compact_res.content is not None
+        assert "\n" not in compact_res.content.rstrip("\n")
+        assert resolve_result_dict(
+            json.loads(compact_res.content)
+        ) == resolve_result_dict(json.loads(full_res.content))
+
+
+@pytest.mark.skipif(not HAS_ORJSON, reason="orjson is not installed")
+def test_compact_orjson_same_as_stdlib() -> None:
+    for obj in [
+        {"a": ["中", 1, True, None, {}], "b": {"c": []}},
+        {"a:1.5": [1.5, 1e16, 1e-7]},
+    ]:
+        assert dumps_orjson(obj, compact=True) == dumps_stdlib(obj, compact=True)
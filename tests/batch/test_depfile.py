@@ -0,0 +1,76 @@
+from pathlib import Path
+from typing import List
+
+from joj3_config_generator.batch import (
+    find_tasks,
+    get_depfile_path,
+    get_listing_stamp_path,
+    run_tasks,
+    write_depfile,
+    write_result_json,
+)
+from joj3_config_generator.utils.deps import Dependencies, format_depfile
+from tests.batch.utils import copy_cases
+
+
+def parse_depfile(content: str) -> List[str]:
+    rule = content.split("\n\n", 1)[0]
+    target, inputs = rule.replace(" \\\n", "").split(":", 1)
+    return [target, *inputs.split()]
+
+
+def test_write_depfile(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    for res in run_tasks(root, find_tasks(root), jobs=1):
+        assert write_depfile(res)
+        assert not write_depfile(res)
+    diff_json_path = root / "diff" / "task.json"
+    target, *inputs = parse_depfile(get_depfile_path(diff_json_path).read_text())
+    assert target == str(diff_json_path)
+    assert inputs == sorted(inputs)
+    for rel_path in [
+        "diff/repo.toml",
+        "diff/task.toml",
+        "diff/task1/case4.in",
+        "diff/task1/case4.out",
+    ]:
+        assert str(root / rel_path) in inputs
+    assert all(Path(path).is_file() for path in inputs)
+    basic_inputs = parse_depfile(
+        get_depfile_path(root / "basic" / "task.json").read_text()
+    )
+    assert str(root / "basic" / "immutable" / ".gitignore") in basic_inputs
+
+
+def test_listing_stamp(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "diff")
+    json_path = root / "diff" / "task.json"
+    stamp_path = get_listing_stamp_path(json_path)
+
+    def convert() -> None:
+        (res,) = run_tasks(root, find_tasks(root), jobs=1)
+        write_result_json(json_path, res.content or "")
+        write_depfile(res)
+
+    convert()
+    assert str(stamp_path) in parse_depfile(get_depfile_path(json_path).read_text())
+    stamp, stamp_mtime = stamp_path.read_text(), stamp_path.stat().st_mtime_ns
+    convert()
+    assert stamp_path.stat().st_mtime_ns == stamp_mtime
+    # an .in file without .out is skipped, the json does not change
+    json_content = json_path.read_text()
+    (root / "diff" / "task1" / "orphan.in").write_text("")
+    convert()
+    assert json_path.read_text() == json_content
+    assert stamp_path.read_text() != stamp
+    assert json_path.stat().st_mtime_ns >= stamp_path.stat().st_mtime_ns
+
+
+def test_format_depfile() -> None:
+    deps = Dependencies(
+        files={Path("a b/repo.toml"): (1, 1), Path("$x#.in"): (1, 1), Path("y"): None}
+    )
+    assert format_depfile(Path("a b/task.json"), deps) == (
+        "a\\ b/task.json: \\\n  $$x\\#.in \\\n  a\\ b/repo.toml\n"
+        "\n$$x\\#.in:\n\na\\ b/repo.toml:\n"
+    )
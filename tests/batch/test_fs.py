@@ -0,0 +1,109 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from joj3_config_generator.api import convert_tree
+from joj3_config_generator.batch import find_tasks, run_tasks
+from joj3_config_generator.loader import load_joj3_repo_toml
+from joj3_config_generator.transformers.repo import get_check_lists, get_immutable_dir
+from joj3_config_generator.utils.fs import (
+    FileSystem,
+    MemoryFileSystem,
+    OSFileSystem,
+    OverlayFileSystem,
+)
+from joj3_config_generator.utils.index import DirectoryIndex
+from joj3_config_generator.utils.tracing import Tracer, set_tracer
+from tests.batch.utils import copy_cases
+
+
+def load_memory_fs(root: Path) -> MemoryFileSystem:
+    return MemoryFileSystem(
+        {path: path.read_bytes() for path in root.glob("**/*") if path.is_file()}
+    )
+
+
+def test_glob_same_as_pathlib(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    memory_fs = load_memory_fs(root)
+    for fs in [OSFileSystem(), memory_fs]:
+        for base_dir in [root, root / "diff", root / "missing"]:
+            for pattern in ["**/*.in", "**/*", "*.toml", "*/cases/*.out", "**"]:
+                assert sorted(fs.glob(base_dir, pattern)) == sorted(
+                    base_dir.glob(pattern)
+                )
+
+
+def test_memory_same_as_disk(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff", "full", "extra-field")
+    tasks = find_tasks(root)
+    expected = [res.content for res in run_tasks(root, tasks, jobs=1)]
+    memory_fs = load_memory_fs(root)
+    shutil.rmtree(root)
+    index = DirectoryIndex(root, memory_fs)
+    assert find_tasks(root, index) == tasks
+    assert [res.content for res in run_tasks(root, tasks, 1, index)] == expected
+    results = dict(convert_tree(root, fs=memory_fs))
+    assert len(results) == len(tasks)
+    assert not root.exists()
+
+
+def test_os_cache_counts(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    tracer = Tracer()
+    set_tracer(tracer)
+    try:
+        fs = OSFileSystem()
+        index = DirectoryIndex(root, fs)
+        list(run_tasks(root, find_tasks(root, index), 1, index))
+    finally:
+        set_tracer(None)
+    counters = tracer.counters
+    assert counters["fs_stat_cache_miss"] == len(fs.stats)
+    assert counters["fs_listdir_cache_miss"] == len(fs.listings)
+    assert counters["fs_stat_cache_hit"] > 0
+    assert counters["fs_stat"] == (
+        counters["fs_stat_cache_hit"] + counters["fs_stat_cache_miss"]
+    )
+    assert counters["fs_read"] >= 4
+    assert "File system:" in tracer.summary()
+
+
+def test_check_lists_read_once(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic")
+    repo_conf = load_joj3_repo_toml(root, root / "basic" / "repo.toml")
+    immutable_dir = get_immutable_dir(repo_conf)
+    tracer = Tracer()
+    set_tracer(tracer)
+    try:
+        # outside of a run, on the uncached disk
+        get_check_lists(repo_conf)
+    finally:
+        set_tracer(None)
+    paths = list(immutable_dir.glob("**/*"))
+    counters = tracer.counters
+    assert counters["fs_listdir_cache_miss"] == counters["fs_listdir"]
+    assert counters["fs_listdir"] == 1 + sum(path.is_dir() for path in paths)
+    assert counters["fs_stat_cache_miss"] == len(paths)
+
+
+def test_overlay_keeps_writes_in_memory(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic")
+    fs = OverlayFileSystem(OSFileSystem())
+    written_path = root / "basic" / "conf.toml"
+    fs.write_text(written_path, "name = 'hw'\n")
+    assert not written_path.exists()
+    assert fs.read_text(written_path) == "name = 'hw'\n"
+    assert fs.is_dir(root / "basic") and not fs.is_dir(written_path)
+    assert sorted(fs.glob(root, "**/*.toml")) == sorted(
+        [written_path, *root.glob("**/*.toml")]
+    )
+    assert fs.read_bytes(root / "basic" / "repo.toml") == (
+        (root / "basic" / "repo.toml").read_bytes()
+    )
+
+
+def test_file_system_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        FileSystem()  # type: ignore[abstract]
@@ -0,0 +1,54 @@
+import hashlib
+import os
+from pathlib import Path
+
+from joj3_config_generator.transformers.repo import (
+    MMAP_THRESHOLD,
+    calc_sha256sum,
+    get_file_sha256sums,
+)
+from joj3_config_generator.utils.hashcache import HashCache
+
+
+def write_old_file(path: Path, content: str) -> None:
+    path.write_text(content)
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+
+def test_hash_cache_hit_and_invalidation(tmp_path: Path) -> None:
+    file_path = tmp_path / "data.bin"
+    write_old_file(file_path, "data")
+    cache = HashCache(tmp_path / "cache.sqlite3")
+    assert cache.get(file_path, os.stat(file_path)) is None
+    cache.put(file_path, os.stat(file_path), calc_sha256sum(file_path))
+    cache.flush()
+    # another process sees the same database
+    other_cache = HashCache(tmp_path / "cache.sqlite3")
+    assert other_cache.get(file_path, os.stat(file_path)) == calc_sha256sum(file_path)
+    write_old_file(file_path, "atad")
+    assert other_cache.get(file_path, os.stat(file_path)) is None
+
+
+def test_hash_cache_skips_recent_files(tmp_path: Path) -> None:
+    file_path = tmp_path / "data.bin"
+    file_path.write_text("data")
+    cache = HashCache(tmp_path / "cache.sqlite3")
+    cache.put(file_path, os.stat(file_path), calc_sha256sum(file_path))
+    cache.flush()
+    assert cache.get(file_path, os.stat(file_path)) is None
+
+
+def test_sha256sums_keep_order(tmp_path: Path) -> None:
+    file_paths = []
+    for i in range(20):
+        file_path = tmp_path / f"file{i}.bin"
+        file_path.write_bytes(os.urandom(1024 * i))
+        file_paths.append(file_path)
+    large_file_path = tmp_path / "large.bin"
+    large_file_path.write_bytes(os.urandom(MMAP_THRESHOLD + 1))
+    file_paths.append(large_file_path)
+    expected = [
+        hashlib.sha256(file_path.read_bytes()).hexdigest() for file_path in file_paths
+    ]
+    assert get_file_sha256sums(file_paths, max_workers=4) == expected
+    assert get_file_sha256sums(file_paths, max_workers=1) == expected
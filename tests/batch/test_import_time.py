@@ -0,0 +1,41 @@
+import subprocess
+import sys
+from typing import Dict
+
+# cumulative import time of joj3_config_generator.main, best of a few runs
+IMPORT_TIME_BUDGET_US = 1_000_000
+# only needed by the create and convert-joj1 commands
+LAZY_MODULES = ["inquirer", "yaml", "tomlkit", "joj3_config_generator.models.answer"]
+
+
+def get_import_times() -> Dict[str, int]:
+    """
+    Import joj3_config_generator.main in a fresh interpreter, and return the
+    cumulative import time in microseconds of every module imported.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import joj3_config_generator.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            import_times[name.strip()] = int(cumulative)
+    return import_times
+
+
+def test_convert_does_not_import_lazy_modules() -> None:
+    import_times = get_import_times()
+    assert "joj3_config_generator.main" in import_times
+    for module in LAZY_MODULES:
+        assert module not in import_times
+
+
+def test_import_time_budget() -> None:
+    best = min(get_import_times()["joj3_config_generator.main"] for _ in range(3))
+    assert best < IMPORT_TIME_BUDGET_US
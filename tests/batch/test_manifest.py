@@ -0,0 +1,99 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from typer.testing import CliRunner
+
+from joj3_config_generator.batch import find_tasks, run_tasks, write_result_json
+from joj3_config_generator.main import app
+from joj3_config_generator.manifest import Manifest
+from joj3_config_generator.utils.hashcache import set_hash_cache
+from tests.batch.utils import copy_cases
+
+
+def convert_all(root: Path) -> None:
+    manifest = Manifest.load(root)
+    for res in run_tasks(root, find_tasks(root), jobs=1):
+        assert res.content is not None
+        write_result_json(res.job.result_json_path, res.content)
+        manifest.update(res)
+    manifest.save()
+
+
+def test_unchanged_tasks_are_fresh(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    convert_all(root)
+    manifest = Manifest.load(root)
+    assert all(manifest.is_fresh(job) for job in find_tasks(root))
+    (root / "diff" / "task.toml").touch()
+    assert all(manifest.is_fresh(job) for job in find_tasks(root))
+
+
+def test_changed_inputs_are_stale(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    convert_all(root)
+    stale_by_change = {
+        "diff/task1/case4.in": lambda p: p.write_text("changed\n"),
+        "diff/task1/case12.out": lambda p: p.touch(),
+        "basic/immutable/.gitignore": lambda p: p.write_text("changed\n"),
+        "basic/task.json": lambda p: p.unlink(),
+    }
+    for rel_path, change in stale_by_change.items():
+        change(root / rel_path)
+        manifest = Manifest.load(root)
+        stale = [
+            job.result_json_path.relative_to(root).as_posix()
+            for job in find_tasks(root)
+            if not manifest.is_fresh(job)
+        ]
+        assert stale == [f"{rel_path.split('/')[0]}/task.json"]
+        convert_all(root)
+
+
+def test_shared_health_check_dependencies(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic")
+    (root / "basic" / "task2.toml").write_text(
+        (root / "basic" / "task.toml").read_text()
+    )
+    convert_all(root)
+    (root / "basic" / "immutable" / ".gitignore").write_text("changed\n")
+    manifest = Manifest.load(root)
+    assert not any(manifest.is_fresh(job) for job in find_tasks(root))
+
+
+@pytest.fixture
+def runner() -> Iterator[CliRunner]:
+    try:
+        yield CliRunner()
+    finally:
+        # convert sets the process wide hash cache
+        set_hash_cache(None)
+
+
+def test_selected_tasks_keep_other_entries(tmp_path: Path, runner: CliRunner) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    options = ["--incremental", "--no-hash-cache"]
+    result = runner.invoke(app, ["convert", str(root), *options])
+    assert result.exit_code == 0, result.output
+    changed_path = root / "diff" / "task.toml"
+    result = runner.invoke(
+        app, ["convert", str(root), *options, "--paths", str(changed_path)]
+    )
+    assert result.exit_code == 0, result.output
+    manifest = Manifest.load(root)
+    assert all(manifest.is_fresh(job) for job in find_tasks(root))
+
+
+def test_reattributed_tasks_are_stale(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path / "root", "basic")
+    copy_cases(root / "basic", "diff")
+    repo_toml_path = root / "basic" / "diff" / "repo.toml"
+    moved_repo_toml_path = repo_toml_path.rename(tmp_path / "repo.toml")
+    convert_all(root)
+    moved_repo_toml_path.rename(repo_toml_path)
+    manifest = Manifest.load(root)
+    fresh = {
+        job.task_toml_path.relative_to(root).as_posix(): manifest.is_fresh(job)
+        for job in find_tasks(root)
+    }
+    assert fresh == {"basic/task.toml": True, "basic/diff/task.toml": False}
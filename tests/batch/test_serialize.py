@@ -0,0 +1,47 @@
+import json
+from typing import Any
+
+import pytest
+
+from joj3_config_generator.utils.serialize import (
+    HAS_ORJSON,
+    dumps_json,
+    dumps_orjson,
+    dumps_stdlib,
+    set_json_backend,
+)
+from tests.batch.utils import CONVERT_CASES_ROOT
+
+pytestmark = pytest.mark.skipif(not HAS_ORJSON, reason="orjson is not installed")
+
+
+def test_orjson_same_as_golden_files() -> None:
+    json_paths = sorted(CONVERT_CASES_ROOT.glob("**/*.json"))
+    assert json_paths
+    for json_path in json_paths:
+        content = json_path.read_text()
+        assert dumps_orjson(json.loads(content)) == content
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        {"a": '\x00\x1f\x7f "\\/é中😀\t\n\r\b\f', "b": [], "c": {}, "d": [{}]},
+        {'"1.5": 2': 1e16, "b": [1e-7, 0.1, -0.0, 1.5e300, 5e-324, 123.0]},
+        {"s": "1e5", "t": "x\n1.5", "u": "\ud800", "v": 2**70},
+        {1: True, 2: None},
+        "x",
+    ],
+)
+def test_orjson_same_as_stdlib(obj: Any) -> None:
+    assert dumps_orjson(obj) == dumps_stdlib(obj)
+
+
+def test_set_json_backend() -> None:
+    try:
+        set_json_backend("json")
+        assert dumps_json({"a": 1.5}) == '{\n    "a": 1.5\n}\n'
+        with pytest.raises(ValueError):
+            set_json_backend("ujson")
+    finally:
+        set_json_backend(None)
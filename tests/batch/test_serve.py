@@ -0,0 +1,98 @@
+import json
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import pytest
+
+from joj3_config_generator.batch import find_tasks, run_tasks
+from joj3_config_generator.serve import (
+    ConvertService,
+    collect_request_log,
+    make_server,
+)
+from joj3_config_generator.utils.logger import logger
+from tests.batch.utils import copy_cases
+
+
+@pytest.fixture
+def service(tmp_path: Path) -> Iterator[ConvertService]:
+    root = copy_cases(tmp_path / "root", "basic", "diff")
+    handler_id = logger.add(collect_request_log, level="WARNING")
+    try:
+        yield ConvertService(root, max_sessions=1)
+    finally:
+        logger.remove(handler_id)
+
+
+def test_convert_requests(service: ConvertService) -> None:
+    root = service.root
+    expected = {
+        str(res.job.task_toml_path): res.content
+        for res in run_tasks(root, find_tasks(root), jobs=1)
+    }
+    response = service.handle({"command": "convert"})
+    assert response["ok"]
+    assert {
+        result["task"]: result["content"] for result in response["results"]
+    } == expected
+    session = service.get_session(root, False)
+    cached = dict(session.results)
+    response = service.handle({"command": "convert", "tasks": ["diff/task.toml"]})
+    assert [result["task"] for result in response["results"]] == [
+        str(root / "diff" / "task.toml")
+    ]
+    assert session.results == cached
+    (root / "diff" / "task1" / "case99.in").write_text("1\n")
+    (root / "diff" / "task1" / "case99.out").write_text("1\n")
+    response = service.handle({"command": "convert", "tasks": ["diff/task.toml"]})
+    assert "case99" in response["results"][0]["content"]
+    basic_job = next(job for job in cached if job.task_toml_path.parent.name == "basic")
+    assert session.results[basic_job] is cached[basic_job]
+
+
+def test_validate_requests(service: ConvertService) -> None:
+    (service.root / "diff" / "task.toml").write_text('name = "x"\nunknown = 1\n')
+    response = service.handle({"command": "validate"})
+    assert not response["ok"]
+    valid = {Path(result["task"]).parent.name: result for result in response["results"]}
+    assert valid["basic"]["valid"]
+    assert not valid["diff"]["valid"]
+    assert any(log["level"] == "ERROR" for log in valid["diff"]["logs"])
+
+
+def test_bad_requests(service: ConvertService) -> None:
+    assert not service.handle({"command": "unknown"})["ok"]
+    response = service.handle({"command": "convert", "tasks": ["missing.toml"]})
+    assert "missing.toml" in response["error"]
+
+
+def test_session_eviction(service: ConvertService, tmp_path: Path) -> None:
+    other_root = copy_cases(tmp_path / "other", "basic")
+    service.handle({"command": "convert"})
+    service.handle({"command": "convert", "root": str(other_root)})
+    assert [root for root, _ in service.sessions] == [other_root]
+
+
+def test_unix_socket(service: ConvertService, tmp_path: Path) -> None:
+    socket_path = tmp_path / "joj3-forge.sock"
+    server = make_server(service, socket_path, None)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(str(socket_path))
+            stream = client.makefile("rw")
+
+            def request(line: str) -> Dict[str, Any]:
+                stream.write(line + "\n")
+                stream.flush()
+                return dict(json.loads(stream.readline()))
+
+            assert request(json.dumps({"command": "convert"}))["ok"]
+            assert "Invalid request" in request("not json")["error"]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,41 @@
+import copy
+
+import pytest
+
+from joj3_config_generator import stream
+from joj3_config_generator.batch import dump_result_json
+from joj3_config_generator.generator import convert_joj3_conf
+from joj3_config_generator.loader import load_joj3_toml
+from joj3_config_generator.stream import dump_result_model
+from tests.batch.utils import CONVERT_CASES_ROOT
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, stream.STREAM_BATCH_SIZE])
+def test_stream_same_as_dump(batch_size: int, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(stream, "STREAM_BATCH_SIZE", batch_size)
+    # the extra-field case fails to load on purpose
+    json_paths = [
+        json_path
+        for json_path in sorted(CONVERT_CASES_ROOT.glob("*/task.json"))
+        if json_path.parent.name != "extra-field"
+    ]
+    assert json_paths
+    for json_path in json_paths:
+        repo_conf, task_conf = load_joj3_toml(
+            CONVERT_CASES_ROOT,
+            json_path.parent / "repo.toml",
+            json_path.parent / "task.toml",
+        )
+        result_model = convert_joj3_conf(repo_conf, task_conf)
+        result_dict = result_model.model_dump(
+            mode="json", by_alias=True, exclude_none=True
+        )
+        assert dump_result_model(result_model) == json_path.read_text()
+        assert dump_result_model(result_model, compact=True) == dump_result_json(
+            copy.deepcopy(result_dict), compact=True
+        )
+        # the cases are put back after the dump
+        assert (
+            result_model.model_dump(mode="json", by_alias=True, exclude_none=True)
+            == result_dict
+        )
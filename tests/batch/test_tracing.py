@@ -0,0 +1,44 @@
+import json
+import shutil
+from pathlib import Path
+
+from joj3_config_generator.batch import find_tasks, run_tasks
+from joj3_config_generator.utils.tracing import get_tracer, start_tracing, stop_tracing
+from tests.batch.utils import copy_cases
+
+
+def test_trace_convert(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path / "root", "basic", "diff")
+    start_tracing()
+    try:
+        results = list(run_tasks(root, find_tasks(root), jobs=2))
+    finally:
+        summary = stop_tracing(tmp_path / "trace.json")
+    assert get_tracer() is None
+    assert all(res.content is not None and res.trace is None for res in results)
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    names = {event["name"] for event in events}
+    for name in ["task", "read toml", "validate", "transform", "parser diff"]:
+        assert name in names
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert "Slowest tasks (2 converted)" in summary
+    assert "diff/task.toml [joj] ex2-asan" in summary
+    assert "Peak memory (tracemalloc)" in summary
+
+
+def test_health_check_hashed_once(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path / "root", "basic")
+    for i in range(3):
+        shutil.copy(root / "basic" / "task.toml", root / "basic" / f"task{i}.toml")
+    start_tracing()
+    try:
+        tracer = get_tracer()
+        assert tracer is not None
+        results = list(run_tasks(root, find_tasks(root), jobs=2))
+    finally:
+        stop_tracing(tmp_path / "trace.json")
+    assert len(results) == 4
+    assert all(res.content is not None for res in results)
+    # hashed in the parent, the workers get the args with the repo
+    assert tracer.counters["health_check_cache_miss"] == 1
+    assert tracer.counters["health_check_cache_hit"] == 4
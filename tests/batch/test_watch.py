@@ -0,0 +1,55 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+import typer
+
+from joj3_config_generator.batch import find_tasks
+from joj3_config_generator.main import convert
+from joj3_config_generator.watch import Watcher
+from tests.batch.utils import copy_cases
+
+
+def test_reconvert_affected_tasks(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    watcher = Watcher(root, jobs=1)
+    watcher.tasks = find_tasks(root, watcher.index)
+    watcher.convert(watcher.tasks)
+    basic_json_path = root / "basic" / "task.json"
+    diff_json_path = root / "diff" / "task.json"
+    basic_mtime = basic_json_path.stat().st_mtime_ns
+    (root / "diff" / "task1" / "case99.in").write_text("1\n")
+    (root / "diff" / "task1" / "case99.out").write_text("1\n")
+    changed = watcher.poll()
+    assert changed == {
+        root / "diff" / "task1" / "case99.in",
+        root / "diff" / "task1" / "case99.out",
+    }
+    watcher.update(changed)
+    assert "case99" in diff_json_path.read_text()
+    assert basic_json_path.stat().st_mtime_ns == basic_mtime
+    (root / "diff" / "task.toml").write_text('name = "renamed"\n')
+    watcher.update(watcher.poll())
+    assert json.loads(diff_json_path.read_text())["name"] == "renamed"
+    assert watcher.poll() == set()
+
+
+def test_removed_tasks_are_dropped(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic", "diff")
+    watcher = Watcher(root, jobs=1)
+    watcher.tasks = find_tasks(root, watcher.index)
+    watcher.convert(watcher.tasks)
+    assert len(watcher.deps) == 2 and len(watcher.repo_confs) == 2
+    shutil.rmtree(root / "diff")
+    watcher.update(watcher.poll())
+    assert [job.repo_toml_path for job in watcher.deps] == [
+        root / "basic" / "repo.toml"
+    ]
+    assert list(watcher.repo_confs) == [root / "basic" / "repo.toml"]
+
+
+def test_watch_rejects_incremental(tmp_path: Path) -> None:
+    root = copy_cases(tmp_path, "basic")
+    with pytest.raises(typer.Exit):
+        convert(root, jobs=1, hash_cache=False, watch=True, incremental=True)
@@ -0,0 +1,12 @@
+import shutil
+from pathlib import Path
+
+CONVERT_CASES_ROOT = Path(__file__).resolve().parent.parent / "convert"
+
+
+def copy_cases(dst: Path, *case_names: str) -> Path:
+    for case_name in case_names:
+        shutil.copytree(CONVERT_CASES_ROOT / case_name, dst / case_name)
+    for json_path in dst.glob("**/*.json"):
+        json_path.unlink()
+    return dst
@@ -0,0 +1,42 @@
+import pytest
+from pydantic import ValidationError
+
+from joj3_config_generator.models import task
+from joj3_config_generator.models.common import Memory, Time, parse_time
+from joj3_config_generator.models.const import DEFAULT_CLOCK_LIMIT_MULTIPLIER
+
+
+def test_case_limits() -> None:
+    stage = task.Stage.model_validate(
+        {
+            "limit": {"cpu": "2s", "mem": "256m"},
+            "case0": {},
+            "case1": {"limit": {"cpu": "1s"}},
+            "case2": {"limit": {"time": "5s"}},
+        }
+    )
+    assert stage.cases["case0"].limit == stage.limit
+    assert stage.cases["case1"].limit.cpu == Time("1s")
+    assert stage.cases["case1"].limit.mem == Memory("256m")
+    assert stage.cases["case1"].limit.time == DEFAULT_CLOCK_LIMIT_MULTIPLIER * Time(
+        "1s"
+    )
+    assert stage.cases["case2"].limit.cpu == Time("2s")
+    assert stage.cases["case2"].limit.time == Time("5s")
+    assert "limit" not in task.Stage.model_validate({"case0": {}}).model_fields_set
+
+
+def test_case_limits_errors() -> None:
+    with pytest.raises(ValidationError, match="limit.cpu"):
+        task.Stage.model_validate({"limit": {"cpu": 1}, "case0": {}})
+    with pytest.raises(ValidationError, match="case0.limit.mem"):
+        task.Stage.model_validate(
+            {"limit": {"cpu": "1s"}, "case0": {"limit": {"mem": 1}}}
+        )
+
+
+def test_parse_cache() -> None:
+    parse_time.cache_clear()
+    for _ in range(3):
+        Time("1s")
+    assert parse_time.cache_info().hits == 2
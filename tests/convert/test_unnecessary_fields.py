@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+from joj3_config_generator.loader import (
+    check_unnecessary_fields,
+    get_field_checks,
+    load_joj3_toml,
+)
+from joj3_config_generator.models import task
+from joj3_config_generator.utils.logger import logger
+
+
+def get_warnings(task_dict: Dict[str, Any]) -> List[str]:
+    messages: List[str] = []
+    handler_id = logger.add(
+        lambda message: messages.append(message.record["message"]), level="WARNING"
+    )
+    try:
+        check_unnecessary_fields(task.Config, task_dict, Path("task.toml"))
+    finally:
+        logger.remove(handler_id)
+    return [message.split("`")[1] for message in messages]
+
+
+def test_unnecessary_fields() -> None:
+    task_dict = {
+        "name": "hw1",
+        "max-total-score": 100,
+        "scoreboard": "scoreboard.csv",
+        "stages": [
+            {
+                "name": "run",
+                "command": "./main",
+                "env": [],
+                "copy-in-cwd": True,
+                "base-case-dir": ".",
+                "limit": {"cpu": "1s", "mem": "256m", "time": "3s", "proc": 50},
+                "parsers": ["diff"],
+                "diff": {"score": 5, "ignore-spaces": True, "max-length": 2048},
+                "files": {"import": [], "export": ["a"]},
+            },
+            {
+                "name": "lint",
+                "parsers": ["keyword"],
+                "keyword": {"keyword": [], "weight": [1]},
+                "limit": {"cpu": 1000000000},
+            },
+        ],
+    }
+    assert get_warnings(task_dict) == [
+        'scoreboard = "scoreboard.csv"',
+        "stages[0].env = []",
+        "stages[0].files.import_ = []",
+        "stages[0].copy_in_cwd = true",
+        'stages[0].limit.mem = "256m"',
+        'stages[0].limit.cpu = "1s"',
+        "stages[0].limit.proc = 50",
+        "stages[0].diff.score = 5",
+        "stages[0].diff.ignore_spaces = true",
+        "stages[0].diff.max_length = 2048",
+        'stages[0].base_case_dir = "."',
+        "stages[1].limit.cpu = 1000000000",
+        "stages[1].keyword.keyword = []",
+    ]
+    assert get_field_checks(task.Config) is get_field_checks(task.Config)
+
+
+def test_unnecessary_stage_limit_after_validation() -> None:
+    case_dir = Path(__file__).parent / "full"
+    messages: List[str] = []
+    handler_id = logger.add(
+        lambda message: messages.append(message.record["message"]), level="WARNING"
+    )
+    try:
+        load_joj3_toml(case_dir, case_dir / "repo.toml", case_dir / "task.toml")
+    finally:
+        logger.remove(handler_id)
+    warned_fields = [message.split("`")[1] for message in messages if "`" in message]
+    for field in ["cpu", "mem", "proc", "stderr", "stdout"]:
+        assert any(
+            warned.startswith(f"stages[0].limit.{field} =") for warned in warned_fields
+        )
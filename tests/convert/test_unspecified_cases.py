@@ -0,0 +1,49 @@
+import random
+from pathlib import Path
+from typing import Set
+
+from joj3_config_generator.models import task
+from joj3_config_generator.transformers.task import CaseIndex, remove_specified_cases
+from joj3_config_generator.utils.fs import MemoryFileSystem, use_fs
+
+
+def remove_specified_cases_naive(testcases: Set[str], case_names: Set[str]) -> Set[str]:
+    return testcases.difference(
+        casei
+        for casei in testcases
+        if any(casei.endswith(casej) for casej in case_names)
+    )
+
+
+def make_cases(n: int, seed: int) -> Set[str]:
+    rng = random.Random(seed)
+    dirs = ["", "cases/", "task1/", "task1/subtask1/", "hidden/case"]
+    return {f"{rng.choice(dirs)}case{rng.randrange(n * 2)}" for _ in range(n)}
+
+
+def test_same_as_naive() -> None:
+    testcases = make_cases(2000, seed=0)
+    case_names = {name.rsplit("/", 1)[-1] for name in make_cases(500, seed=1)}
+    case_names |= {"ase1", "task1/case3", "1"}
+    assert remove_specified_cases(
+        testcases, case_names
+    ) == remove_specified_cases_naive(testcases, case_names)
+    assert remove_specified_cases(testcases, {""}) == set()
+    assert remove_specified_cases(testcases, set()) == testcases
+
+
+def test_case_index_duplicate_out_names() -> None:
+    base_dir = Path("/cases")
+    fs = MemoryFileSystem(
+        {
+            base_dir / rel_path: b""
+            for rel_path in ["b/x.out", "a/c/x.out", "a/x.out", "c/x.in"]
+        }
+    )
+    with use_fs(fs):
+        case_index = CaseIndex(base_dir)
+    # the closest to the case directory, then the first by path
+    assert case_index.find_out("x", task.Case()) == base_dir / "a" / "x.out"
+    assert (
+        case_index.find_out("x", task.Case(out="b/x.out")) == base_dir / "b" / "x.out"
+    )